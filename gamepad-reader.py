@@ -1,25 +1,1369 @@
 import sys
 import time
 import os
+import argparse
+import threading
+import asyncio
+import collections
+import struct
+import timeit
+import io
+import contextlib
+import random
+import mmap
+import bisect
+import array
+import errno
+import math
+import json
+import platform
+import datetime
+import http.server
+import ctypes
+import ctypes.util
+import fcntl
+import select
+import socket
+import heapq
+import itertools
 import usb.core
 import usb.util
 from usb.backend import libusb1
 
-class GamePadReader:
+from gamepad_state import (
+    DPAD_UP, DPAD_DOWN, DPAD_LEFT, DPAD_RIGHT,
+    BUTTON_L1, BUTTON_R1, BUTTON_MODE, BUTTON_A, BUTTON_B, BUTTON_X, BUTTON_Y,
+    BUTTON_START, BUTTON_SELECT, BUTTON_TURBO, BUTTON_CLEAR,
+    DPAD_NAMES, BUTTON_NAMES, SPECIAL_NAMES, axis_percent, GamepadState,
+    SharedStatePublisher, SharedStateReader,
+    parse_datagram_address, StateDatagramSender, StateDatagramReceiver,
+)
+
+try:
+    import usb1  # python-libusb1, only needed for the async transfer engine
+except ImportError:
+    usb1 = None
+
+try:
+    import numpy as np  # Only needed for batch decoding
+except ImportError:
+    np = None
+
+def interpret_stick_axis(high_byte, low_byte):
+    """
+    Interpret stick axis as signed 16-bit value (big-endian)
+    0x0000 (     0) =   0%
+    0x8000 ( 32768) = 100%
+    0x7FFF (-32767) = -100%
+    """
+    # Combine bytes in big-endian order
+    value = (high_byte << 8) | low_byte
+    
+    # Convert to 16-bit signed integer
+    if value > 32767:  # Convert to negative if high bit is set
+        value -= 65536
+    
+    # Convert to percentage
+    if value == 0:
+        return 0
+    elif value > 0:
+        return (value / 32768) * 100
+    else:
+        return (value / 32767) * 100
+
+# Length of an input report
+REPORT_SIZE = 20
+
+# Report layout: bytes 2-5 unsigned, sticks little-endian signed 16-bit, byte 14
+REPORT_STRUCT = struct.Struct("<2x4B4hB")
+
+def decode_report(data, timestamp_ns=None):
+    """
+    Decode one raw report with a single precompiled struct unpack.
+
+    Returns None for packets too short to be an input report (e.g. the
+    LED/status messages some controllers send on connect).
+    """
+    if len(data) < REPORT_STRUCT.size:
+        return None
+    byte2, byte3, l2, r2, left_x, left_y, right_x, right_y, byte14 = \
+        REPORT_STRUCT.unpack_from(data)
+    return GamepadState(byte3 | (byte2 & 0xF0) << 8 | byte14 << 16, byte2 & 0x0F,
+                        l2, r2, left_x, left_y, right_x, right_y, timestamp_ns)
+
+# Field layout returned by decode_reports_batch(); axes are in percent
+BATCH_FIELDS = (
+    ("buttons", "<u4"), ("dpad", "u1"), ("l2", "u1"), ("r2", "u1"),
+    ("left_x", "<f8"), ("left_y", "<f8"), ("right_x", "<f8"), ("right_y", "<f8"),
+)
+
+def decode_reports_batch(reports, report_size=REPORT_SIZE):
+    """
+    Decode many reports at once with NumPy.
+
+    reports is an (N, report_size) uint8 array or a bytes-like buffer of
+    N back-to-back reports. Returns a structured array with BATCH_FIELDS:
+    the same button bitmask and D-pad nibble as GamepadState, raw trigger
+    bytes, and stick axes converted to percent like interpret_stick_axis.
+    """
+    if np is None:
+        raise RuntimeError("NumPy is required for batch decoding (pip install numpy)")
+
+    if isinstance(reports, (bytes, bytearray, memoryview)):
+        raw = np.frombuffer(reports, dtype=np.uint8).reshape(-1, report_size)
+    else:
+        raw = np.asarray(reports, dtype=np.uint8)
+    if raw.ndim != 2 or raw.shape[1] < REPORT_STRUCT.size:
+        raise ValueError(f"Expected (N, {report_size}) reports, got shape {raw.shape}")
+
+    out = np.empty(len(raw), dtype=list(BATCH_FIELDS))
+    byte2 = raw[:, 2]
+    out["buttons"] = (raw[:, 3].astype(np.uint32) |
+                      (byte2 & 0xF0).astype(np.uint32) << 8 |
+                      raw[:, 14].astype(np.uint32) << 16)
+    out["dpad"] = byte2 & 0x0F
+    out["l2"] = raw[:, 4]
+    out["r2"] = raw[:, 5]
+
+    # Bytes 6-13 are four little-endian signed 16-bit axes
+    axes = np.ascontiguousarray(raw[:, 6:14]).view("<i2").astype(np.float64)
+    percent = np.where(axes >= 0, axes / 32768, axes / 32767) * 100
+    out["left_x"] = percent[:, 0]
+    out["left_y"] = percent[:, 1]
+    out["right_x"] = percent[:, 2]
+    out["right_y"] = percent[:, 3]
+    return out
+
+# Field flags reported by ChangeFilter
+CHANGED_BUTTONS = 0x01
+CHANGED_DPAD = 0x02
+CHANGED_TRIGGERS = 0x04
+CHANGED_LEFT_STICK = 0x08
+CHANGED_RIGHT_STICK = 0x10
+
+CHANGED_NAMES = ((CHANGED_BUTTONS, "buttons"), (CHANGED_DPAD, "dpad"),
+                 (CHANGED_TRIGGERS, "triggers"), (CHANGED_LEFT_STICK, "left_stick"),
+                 (CHANGED_RIGHT_STICK, "right_stick"))
+
+def changed_fields(old, new):
+    """CHANGED_* flags for the fields that differ between two states"""
+    if old is None:
+        return (CHANGED_BUTTONS | CHANGED_DPAD | CHANGED_TRIGGERS |
+                CHANGED_LEFT_STICK | CHANGED_RIGHT_STICK)
+    changed = 0
+    if old.buttons != new.buttons:
+        changed |= CHANGED_BUTTONS
+    if old.dpad != new.dpad:
+        changed |= CHANGED_DPAD
+    if old.l2 != new.l2 or old.r2 != new.r2:
+        changed |= CHANGED_TRIGGERS
+    if old.left_x != new.left_x or old.left_y != new.left_y:
+        changed |= CHANGED_LEFT_STICK
+    if old.right_x != new.right_x or old.right_y != new.right_y:
+        changed |= CHANGED_RIGHT_STICK
+    return changed
+
+class ChangeFilter:
+    """
+    Drop reports identical to the previous one.
+
+    Controllers resend the same report while idle; a raw bytes compare
+    rejects those before any decoding, so an idle pad costs almost nothing.
+    """
+
+    def __init__(self):
+        self.last_report = None
+        self.last_state = None
+        self.suppressed = 0
+
+    def feed(self, timestamp_ns, data):
+        """Return (state, CHANGED_* flags) if the report changed, else None"""
+        report = bytes(data)
+        if report == self.last_report:
+            self.suppressed += 1
+            return None
+
+        state = decode_report(report, timestamp_ns)
+        if state is None:
+            return None  # Not an input report, keep comparing against the last one
+        changed = changed_fields(self.last_state, state)
+        self.last_report = report
+        self.last_state = state
+        if not changed:
+            # Bytes outside the decoded fields changed
+            self.suppressed += 1
+            return None
+        return state, changed
+
+# Edge events use the button bitmask with the D-pad nibble in bits 8-11,
+# i.e. where it sits in byte 2
+BUTTON_DPAD_UP = DPAD_UP << 8
+BUTTON_DPAD_DOWN = DPAD_DOWN << 8
+BUTTON_DPAD_LEFT = DPAD_LEFT << 8
+BUTTON_DPAD_RIGHT = DPAD_RIGHT << 8
+
+EVENT_BUTTON_NAMES = dict(BUTTON_NAMES + SPECIAL_NAMES + (
+    (BUTTON_DPAD_UP, "Up"), (BUTTON_DPAD_DOWN, "Down"),
+    (BUTTON_DPAD_LEFT, "Left"), (BUTTON_DPAD_RIGHT, "Right"),
+))
+
+class ButtonEvent(collections.namedtuple("ButtonEvent", ("button", "pressed", "timestamp_ns"))):
+    """A single button press or release, stamped with the USB read time"""
+
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return EVENT_BUTTON_NAMES.get(self.button, f"0x{self.button:06x}")
+
+class ButtonEdgeDetector:
+    """Turn successive states into press/release events by XOR-ing bitmasks"""
+
     def __init__(self):
+        self.buttons = 0
+
+    def feed(self, state):
+        """Return a list of ButtonEvent for the bits that changed"""
+        buttons = state.buttons | state.dpad << 8
+        changed = buttons ^ self.buttons
+        if not changed:
+            return []
+        self.buttons = buttons
+
+        # Visit only the changed bits, lowest first
+        events = []
+        while changed:
+            bit = changed & -changed
+            events.append(ButtonEvent(bit, bool(buttons & bit), state.timestamp_ns))
+            changed ^= bit
+        return events
+
+# The four stick axes inside a report, as packed by REPORT_STRUCT
+AXES_STRUCT = struct.Struct("<4h")
+AXES_OFFSET = 6
+
+RESPONSE_CURVES = {
+    "linear": lambda x: x,
+    "quadratic": lambda x: x * x,
+    "cubic": lambda x: x * x * x,
+}
+
+# Steps of the radial scale table; distances are quantized to 1/RADIAL_STEPS
+RADIAL_STEPS = 4096
+
+def response_curve(curve):
+    """A RESPONSE_CURVES name, a power exponent, or any callable on 0-1"""
+    if callable(curve):
+        return curve
+    if curve in RESPONSE_CURVES:
+        return RESPONSE_CURVES[curve]
+    try:
+        exponent = float(curve)
+    except ValueError:
+        raise ValueError(f"unknown response curve {curve!r}") from None
+    if exponent <= 0:
+        raise ValueError("response curve exponent must be positive")
+    return lambda x: x ** exponent
+
+def normalize_axis(value):
+    """Raw signed 16-bit axis value to -1..1"""
+    return max(-1.0, value / 32767)
+
+def _axis_values():
+    """Every raw axis value, in lookup table order (indexed by value & 0xFFFF)"""
+    return itertools.chain(range(32768), range(-32768, 0))
+
+class StickResponse:
+    """
+    Deadzone and response curve for one stick.
+
+    mode "axial" applies the deadzone to each axis on its own; "radial"
+    applies it to the distance from center, so small diagonal movements
+    are not clipped to an axis. Outside the deadzone the remaining travel
+    is rescaled to 0-1 and passed through curve. compile() turns this
+    into lookup tables so the per-report cost is a few table reads.
+    """
+
+    def __init__(self, deadzone=0.0, curve="linear", mode="radial"):
+        if mode not in ("radial", "axial"):
+            raise ValueError(f"unknown deadzone mode {mode!r}")
+        if not 0 <= deadzone < 1:
+            raise ValueError("deadzone must be between 0 and 1")
+        self.deadzone = deadzone
+        self.curve = response_curve(curve)
+        self.mode = mode
+
+    def shape(self, magnitude):
+        """Output magnitude (0-1) for an input magnitude (0-1)"""
+        if magnitude <= self.deadzone:
+            return 0.0
+        travel = min(1.0, (magnitude - self.deadzone) / (1 - self.deadzone))
+        return min(1.0, max(0.0, self.curve(travel)))
+
+    def compile(self, normalize_x=normalize_axis, normalize_y=normalize_axis):
+        """
+        Build the lookup tables and return apply(x, y) -> (x, y).
+
+        apply() maps raw axis values to shaped raw values in the same
+        signed 16-bit range. normalize_x/normalize_y map a raw value to
+        -1..1 and are only called here, never per report.
+        """
+        if self.mode == "axial":
+            table_x = array.array("h", (self._axial(normalize_x(v)) for v in _axis_values()))
+            table_y = array.array("h", (self._axial(normalize_y(v)) for v in _axis_values()))
+
+            def apply(x, y):
+                return table_x[x & 0xFFFF], table_y[y & 0xFFFF]
+            return apply
+
+        table_x = array.array("d", map(normalize_x, _axis_values()))
+        table_y = array.array("d", map(normalize_y, _axis_values()))
+        # Output per unit of input at each distance from center, times full scale
+        scales = array.array("d", (self.shape(i / RADIAL_STEPS) * RADIAL_STEPS / i * 32767
+                                   for i in range(1, RADIAL_STEPS + 1)))
+        scales.insert(0, scales[0])  # The first bucket has no lower edge; extend the next one
+        hypot = math.hypot
+
+        def apply(x, y):
+            fx = table_x[x & 0xFFFF]
+            fy = table_y[y & 0xFFFF]
+            scale = scales[min(int(hypot(fx, fy) * RADIAL_STEPS), RADIAL_STEPS)]
+            # scale belongs to the bucket's lower edge, so a steep curve can overshoot
+            x = int(fx * scale)
+            y = int(fy * scale)
+            return max(-32767, min(32767, x)), max(-32767, min(32767, y))
+        return apply
+
+    def _axial(self, value):
+        shaped = round(self.shape(abs(value)) * 32767)
+        return -shaped if value < 0 else shaped
+
+STICK_AXES = ("left_x", "left_y", "right_x", "right_y")
+
+CALIBRATION_FILE = os.path.join(
+    os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"),
+    "usb-gamepad-reader", "calibration.json")
+
+# Smallest measured reach (raw units) past a stick's center or a trigger's
+# rest that counts as swept; below it the default range is kept, so a few
+# counts of noise are not stretched to full scale
+MIN_AXIS_SPAN = 8192
+MIN_TRIGGER_SPAN = 64
+
+class Calibration:
+    """
+    Measured range of one controller's sticks and triggers.
+
+    axes maps each of STICK_AXES to its raw (min, center, max); triggers
+    maps "l2"/"r2" to the raw (rest, max) bytes. The defaults describe an
+    ideal pad, for which the correction is the identity. A stick side or
+    trigger that was not swept while calibrating keeps its measured
+    center or rest but the default extreme (see unswept()).
+    """
+
+    def __init__(self, axes=None, triggers=None):
+        self.axes = {axis: (-32768, 0, 32767) for axis in STICK_AXES}
+        self.axes.update(axes or {})
+        self.triggers = {"l2": (0, 255), "r2": (0, 255)}
+        self.triggers.update(triggers or {})
+
+    def axis_normalizer(self, axis):
+        """Function mapping a raw value of axis to -1..1 around its center"""
+        low, center, high = self.axes[axis]
+        below = center - low if center - low >= MIN_AXIS_SPAN else center + 32768
+        above = high - center if high - center >= MIN_AXIS_SPAN else 32767 - center
+        below = max(1, below)
+        above = max(1, above)
+
+        def normalize(value):
+            offset = value - center
+            return max(-1.0, min(1.0, offset / (above if offset > 0 else below)))
+        return normalize
+
+    def trigger_table(self, trigger):
+        """256-byte table mapping a raw trigger byte to the full 0-255 range"""
+        rest, high = self.triggers[trigger]
+        if high - rest < MIN_TRIGGER_SPAN:
+            high = 255
+        span = max(1, high - rest)
+        return bytes(min(255, max(0, round((value - rest) * 255 / span)))
+                     for value in range(256))
+
+    def unswept(self):
+        """Names of the axes and triggers that keep (part of) the default range"""
+        names = [axis for axis, (low, center, high) in self.axes.items()
+                 if center - low < MIN_AXIS_SPAN or high - center < MIN_AXIS_SPAN]
+        names += [name for name, (rest, high) in self.triggers.items()
+                  if high - rest < MIN_TRIGGER_SPAN]
+        return names
+
+    def to_dict(self):
+        return {"axes": {axis: list(values) for axis, values in self.axes.items()},
+                "triggers": {name: list(values) for name, values in self.triggers.items()}}
+
+    @classmethod
+    def from_dict(cls, profile):
+        return cls({axis: tuple(values) for axis, values in profile.get("axes", {}).items()},
+                   {name: tuple(values) for name, values in profile.get("triggers", {}).items()})
+
+    def format(self):
+        """Human readable summary lines"""
+        lines = [f"  {axis:8s} min {low:6d}  center {center:6d}  max {high:6d}"
+                 for axis, (low, center, high) in self.axes.items()]
+        lines += [f"  {name:8s} rest {rest:3d}  max {high:3d}"
+                  for name, (rest, high) in self.triggers.items()]
+        return lines
+
+def load_calibration(key, path=CALIBRATION_FILE):
+    """Calibration stored for the device key, or None"""
+    try:
+        with open(path) as f:
+            profiles = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Could not read calibration file {path}: {e}")
+        return None
+    profile = profiles.get(key)
+    return Calibration.from_dict(profile) if profile else None
+
+def save_calibration(key, calibration, path=CALIBRATION_FILE):
+    """Store calibration for the device key, keeping other devices' profiles"""
+    try:
+        with open(path) as f:
+            profiles = json.load(f)
+    except (OSError, ValueError):
+        profiles = {}
+    profiles[key] = calibration.to_dict()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(profiles, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+class StickShaper:
+    """
+    Apply calibration and a StickResponse to each stick of every report.
+
+    Calibration is folded into the same lookup tables as the response, and
+    into 256-entry trigger tables, so correcting a report costs no more
+    than shaping it. apply_report() returns a copy of the report with the
+    axes and triggers rewritten, so every later stage (display, change
+    filter, outputs) sees corrected values through the unchanged layout.
+    """
+
+    def __init__(self, left=None, right=None, calibration=None):
+        self.left = left or StickResponse()
+        self.right = right or StickResponse()
+        self.calibration = calibration
+        self.compile()
+
+    def compile(self):
+        """(Re)build the lookup tables of both sticks and the triggers"""
+        calibration = self.calibration
+        if calibration is None:
+            self.apply_left = self.left.compile()
+            self.apply_right = self.right.compile()
+            self.l2_table = self.r2_table = None
+            return
+        normalize = calibration.axis_normalizer
+        self.apply_left = self.left.compile(normalize("left_x"), normalize("left_y"))
+        self.apply_right = self.right.compile(normalize("right_x"), normalize("right_y"))
+        self.l2_table = calibration.trigger_table("l2")
+        self.r2_table = calibration.trigger_table("r2")
+
+    def apply(self, state):
+        """Correct and shape the axes and triggers of a GamepadState in place"""
+        state.left_x, state.left_y = self.apply_left(state.left_x, state.left_y)
+        state.right_x, state.right_y = self.apply_right(state.right_x, state.right_y)
+        if self.l2_table is not None:
+            state.l2 = self.l2_table[state.l2]
+            state.r2 = self.r2_table[state.r2]
+        return state
+
+    def apply_report(self, data):
+        """Copy of a raw report with shaped axes; short packets pass through"""
+        if len(data) < REPORT_STRUCT.size:
+            return data
+        report = bytearray(data)
+        left_x, left_y, right_x, right_y = AXES_STRUCT.unpack_from(report, AXES_OFFSET)
+        left_x, left_y = self.apply_left(left_x, left_y)
+        right_x, right_y = self.apply_right(right_x, right_y)
+        AXES_STRUCT.pack_into(report, AXES_OFFSET, left_x, left_y, right_x, right_y)
+        if self.l2_table is not None:
+            report[4] = self.l2_table[report[4]]
+            report[5] = self.r2_table[report[5]]
+        return report
+
+class EmaFilter:
+    """
+    Exponential moving average: each output moves alpha of the way to the
+    input. alpha of 1 passes input through; smaller values smooth more
+    but lag more.
+    """
+
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, alpha=0.5):
+        if not 0 < alpha <= 1:
+            raise ValueError("EMA alpha must be in (0, 1]")
+        self.alpha = alpha
+        self.value = None
+
+    def __call__(self, value, timestamp_ns):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def reset(self):
+        self.value = None
+
+class OneEuroFilter:
+    """
+    One Euro filter (Casiez et al., 2012): a low-pass filter whose cutoff
+    rises with the speed of the signal, so a resting stick is smoothed
+    heavily (min_cutoff, in Hz) while fast movements get little lag
+    (beta, per full-scale unit/s). Uses the report timestamps, so it
+    adapts to the actual report rate.
+    """
+
+    __slots__ = ("min_cutoff", "beta", "d_cutoff", "value", "speed", "last_ns")
+
+    def __init__(self, min_cutoff=1.0, beta=0.5, d_cutoff=1.0):
+        if min_cutoff <= 0 or d_cutoff <= 0 or beta < 0:
+            raise ValueError("One Euro cutoffs must be positive and beta non-negative")
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value = None
+        self.speed = 0.0
+        self.last_ns = None
+
+    def __call__(self, value, timestamp_ns):
+        if self.value is None:
+            self.value = value
+            self.last_ns = timestamp_ns
+            return value
+        dt = (timestamp_ns - self.last_ns) / 1e9
+        if dt <= 0:
+            return self.value
+        self.last_ns = timestamp_ns
+
+        # Smoothing factor of a first-order low-pass at cutoff Hz: 1 / (1 + tau / dt)
+        speed = (value - self.value) / dt
+        self.speed += (speed - self.speed) / (1 + 1 / (2 * math.pi * self.d_cutoff * dt))
+        cutoff = self.min_cutoff + self.beta * abs(self.speed)
+        self.value += (value - self.value) / (1 + 1 / (2 * math.pi * cutoff * dt))
+        return self.value
+
+    def reset(self):
+        self.value = None
+        self.speed = 0.0
+        self.last_ns = None
+
+def axis_filter(spec):
+    """
+    Filter from "ema[:ALPHA]", "one-euro[:MIN_CUTOFF[,BETA[,D_CUTOFF]]]"
+    or "none" (returns None)
+    """
+    name, _, params = spec.partition(":")
+    try:
+        values = [float(v) for v in params.split(",")] if params else []
+    except ValueError:
+        raise ValueError(f"invalid filter parameters in {spec!r}") from None
+    if name == "none" and not values:
+        return None
+    if name == "ema" and len(values) <= 1:
+        return EmaFilter(*values)
+    if name == "one-euro" and len(values) <= 3:
+        return OneEuroFilter(*values)
+    raise ValueError(f"unknown filter {spec!r}")
+
+class AxisSmoother:
+    """
+    Per-axis smoothing filters for the four stick axes of each report.
+
+    filters maps names from STICK_AXES to a filter (EmaFilter,
+    OneEuroFilter or any callable(value, timestamp_ns)); axes without one
+    pass through. Filters run on values scaled to -1..1 and keep their
+    state in preallocated slots, so a report costs no new containers.
+
+    Pads that only report on change send nothing while a stick rests, which
+    would leave the output wherever the last report took it. settle() is
+    called while no reports arrive; once none has for settle_time seconds
+    it snaps the filters to the last raw report and returns it.
+    """
+
+    def __init__(self, filters, settle_time=0.05):
+        unknown = set(filters) - set(STICK_AXES)
+        if unknown:
+            raise ValueError(f"unknown axis {sorted(unknown)[0]!r}")
+        self.filters = tuple(filters.get(axis) for axis in STICK_AXES)
+        self.settle_ns = int(settle_time * 1e9)
+        self.last_report = None  # Newest raw report, until settle() used it
+        self.last_ns = 0
+
+    def reset(self):
+        for axis_filter in self.filters:
+            if axis_filter is not None:
+                axis_filter.reset()
+        self.last_report = None
+
+    def settle(self, timestamp_ns):
+        """
+        The last raw report if no report arrived for settle_time, with the
+        filters snapped to its axes; None if there is nothing to settle
+        """
+        report = self.last_report
+        if report is None or timestamp_ns - self.last_ns < self.settle_ns:
+            return None
+        self.last_report = None
+        for axis_filter, value in zip(self.filters, AXES_STRUCT.unpack_from(report, AXES_OFFSET)):
+            if axis_filter is not None:
+                axis_filter.reset()
+                axis_filter(value / 32767, timestamp_ns)
+        return report
+
+    def apply_report(self, timestamp_ns, data):
+        """Copy of a raw report with filtered axes; short packets pass through"""
+        if len(data) < REPORT_STRUCT.size:
+            return data
+        report = bytearray(data)
+        axes = AXES_STRUCT.unpack_from(report, AXES_OFFSET)
+        f0, f1, f2, f3 = self.filters
+        AXES_STRUCT.pack_into(
+            report, AXES_OFFSET,
+            round(f0(axes[0] / 32767, timestamp_ns) * 32767) if f0 else axes[0],
+            round(f1(axes[1] / 32767, timestamp_ns) * 32767) if f1 else axes[1],
+            round(f2(axes[2] / 32767, timestamp_ns) * 32767) if f2 else axes[2],
+            round(f3(axes[3] / 32767, timestamp_ns) * 32767) if f3 else axes[3])
+        self.last_report = data
+        self.last_ns = timestamp_ns
+        return report
+
+def format_report_lines(data):
+    """Display lines for one raw report, as shown by process_data"""
+    # Raw data for reference
+    lines = ["Raw data: " + ' '.join([f"{x:02x}" for x in data]), "-" * 60]
+
+    state = decode_report(data)
+    if state is None:
+        return lines
+
+    crosskey_states = state.dpad_names
+    if crosskey_states:
+        lines.append(f"Crosskey: {'-'.join(crosskey_states)}")
+
+    buttons_pressed = state.button_names
+    lines.append("Buttons pressed: " + (", ".join(buttons_pressed) if buttons_pressed else "None"))
+
+    left_stick_x, left_stick_y = state.left_stick
+    lines.append(f"Left Stick: X: {left_stick_x:6.1f}% | Y: {left_stick_y:6.1f}%")
+
+    right_stick_x, right_stick_y = state.right_stick
+    lines.append(f"Right Stick: X: {right_stick_x:6.1f}% | Y: {right_stick_y:6.1f}%")
+
+    # Triggers
+    lines.append(f"L2 Trigger: {state.l2_level:6.1%}")
+    lines.append(f"R2 Trigger: {state.r2_level:6.1%}")
+
+    special_buttons = state.special_names
+    if special_buttons:
+        lines.append("Special Buttons: " + ", ".join(special_buttons))
+    return lines
+
+class TerminalRenderer:
+    """
+    Redraw the newest report at a capped frame rate on its own thread.
+
+    The read loop only calls update(), which stores a reference to the
+    latest raw report; decoding and terminal output happen here at most
+    fps times per second. Only lines that differ from what is already on
+    screen are rewritten, using cursor addressing.
+    """
+
+    def __init__(self, fps=30, stream=None):
+        self.frame_interval = 1 / fps
+        self.stream = stream or sys.stdout
+        self.latest = None
+        self.drawn = None
+        self.screen = []
+        self.frames = 0
+        self.running = False
+        self.thread = None
+
+    def update(self, timestamp_ns, data):
+        """Publish a new report; never blocks"""
+        self.latest = data
+
+    def draw(self):
+        """Rewrite the lines that changed since the previous frame"""
+        data = self.latest
+        if data is None or data is self.drawn:
+            return
+        self.drawn = data
+
+        lines = format_report_lines(data)
+        out = []
+        for row, line in enumerate(lines, 1):
+            if row > len(self.screen) or self.screen[row - 1] != line:
+                out.append(f"\033[{row};1H{line}\033[K")
+        for row in range(len(lines) + 1, len(self.screen) + 1):
+            out.append(f"\033[{row};1H\033[K")  # Line no longer shown
+        self.screen = lines
+
+        if out:
+            self.stream.write("".join(out) + f"\033[{len(lines) + 1};1H")
+            self.stream.flush()
+        self.frames += 1
+
+    def run(self):
+        self.stream.write("\033[2J\033[H")  # Clear screen once
+        next_frame = time.monotonic()
+        while self.running:
+            self.draw()
+            next_frame += self.frame_interval
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_frame = time.monotonic()  # Fell behind, don't try to catch up
+        self.draw()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="gamepad-renderer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+# Capture file: header, then fixed-size records of
+# (monotonic ns timestamp, report length, report bytes padded to payload size)
+CAPTURE_MAGIC = b"GPRC"
+CAPTURE_VERSION = 1
+CAPTURE_HEADER = struct.Struct("<4sHHHH")  # magic, version, payload size, vendor, product
+
+def capture_record_struct(payload_size):
+    return struct.Struct(f"<QB{payload_size}s")
+
+class CaptureWriter:
+    """
+    Write raw reports to a new compact binary capture file.
+
+    Records are packed into a preallocated buffer and written in batches.
+    A background thread flushes the file every flush_interval seconds, so
+    records reach disk even while a pad that only reports on change sits
+    idle. An existing file is only replaced with overwrite=True
+    (FileExistsError otherwise). With the default 20-byte payload a
+    record is 29 bytes, about 100 MB per hour at 1 kHz.
+    """
+
+    def __init__(self, path, payload_size=REPORT_SIZE, vendor_id=0, product_id=0,
+                 flush_interval=1.0, batch_records=256, overwrite=False):
+        self.path = path
+        self.payload_size = payload_size
+        self.record = capture_record_struct(payload_size)
+        self.flush_interval = flush_interval
+        self.buffer = bytearray(self.record.size * batch_records)
+        self.batch_records = batch_records
+        self.pending = 0
+        self.records = 0
+        self.lock = threading.Lock()  # write() runs on the read loop, flushes on the timer
+
+        self.file = open(path, "wb" if overwrite else "xb")
+        self.file.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION,
+                                            payload_size, vendor_id, product_id))
+
+        self.stop_flushing = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_loop, name="capture-flush",
+                                        daemon=True)
+        self.flusher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, timestamp_ns, data):
+        """Append one report; reports longer than the payload are truncated"""
+        length = min(len(data), self.payload_size)
+        with self.lock:
+            self.record.pack_into(self.buffer, self.pending * self.record.size,
+                                  timestamp_ns, length, bytes(data[:length]))
+            self.pending += 1
+            self.records += 1
+            if self.pending == self.batch_records:
+                self._write_pending()
+
+    def _flush_loop(self):
+        while not self.stop_flushing.wait(self.flush_interval):
+            self.flush()
+
+    def _write_pending(self):
+        if self.pending:
+            with memoryview(self.buffer) as view:
+                self.file.write(view[:self.pending * self.record.size])
+            self.pending = 0
+
+    def flush(self):
+        """Write buffered records and flush them to the OS"""
+        with self.lock:
+            if self.file.closed:
+                return
+            self._write_pending()
+            self.file.flush()
+
+    def close(self):
+        self.stop_flushing.set()
+        if self.flusher is not threading.current_thread():
+            self.flusher.join()
+        with self.lock:
+            if not self.file.closed:
+                self._write_pending()
+                self.file.close()
+
+class CaptureReplay:
+    """
+    Memory-mapped reader for capture files written by CaptureWriter.
+
+    Records are returned as (timestamp_ns, memoryview) pairs that point
+    straight into the mapping, so nothing is copied; the views are only
+    valid until close(). A sparse index holding every index_stride-th
+    timestamp makes seek() a binary search.
+    """
+
+    def __init__(self, path, index_stride=1024):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is empty, not a capture file")
+
+        if len(self.map) < CAPTURE_HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is too short to be a capture file")
+        magic, version, payload_size, self.vendor_id, self.product_id = \
+            CAPTURE_HEADER.unpack_from(self.map)
+        if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {CAPTURE_VERSION} capture file")
+
+        self.payload_size = payload_size
+        self.record = capture_record_struct(payload_size)
+        self.view = memoryview(self.map)
+        self.count = (len(self.map) - CAPTURE_HEADER.size) // self.record.size
+        self.index_stride = index_stride
+        self.index = [self.timestamp(i) for i in range(0, self.count, index_stride)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("record index out of range")
+        offset = CAPTURE_HEADER.size + i * self.record.size
+        timestamp_ns = int.from_bytes(self.map[offset:offset + 8], "little")
+        length = self.map[offset + 8]
+        return timestamp_ns, self.view[offset + 9:offset + 9 + length]
+
+    def timestamp(self, i):
+        """Capture timestamp of record i"""
+        offset = CAPTURE_HEADER.size + i * self.record.size
+        return int.from_bytes(self.map[offset:offset + 8], "little")
+
+    def seek(self, timestamp_ns):
+        """Index of the first record captured at or after timestamp_ns"""
+        # Find the index block, then binary search inside it
+        block = bisect.bisect_right(self.index, timestamp_ns) - 1
+        if block < 0:
+            return 0
+        lo = block * self.index_stride
+        hi = min(lo + self.index_stride, self.count)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamp(mid) < timestamp_ns:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def records(self, start=0):
+        """Iterate (timestamp_ns, memoryview) from record start"""
+        for i in range(start, self.count):
+            yield self[i]
+
+    def replay(self, speed=1.0, start=0):
+        """
+        Iterate records paced like the original capture.
+
+        speed scales playback (2.0 = twice as fast); 0 or None replays as
+        fast as possible.
+        """
+        if not speed:
+            yield from self.records(start)
+            return
+
+        wall_start_ns = time.monotonic_ns()
+        first_ns = None
+        for timestamp_ns, report in self.records(start):
+            if first_ns is None:
+                first_ns = timestamp_ns
+            due_ns = wall_start_ns + (timestamp_ns - first_ns) / speed
+            delay = (due_ns - time.monotonic_ns()) / 1e9
+            if delay > 0:
+                time.sleep(delay)
+            yield timestamp_ns, report
+
+    def close(self):
+        """Unmap the file; views handed out earlier must not be used after this"""
+        if getattr(self, "view", None) is not None:
+            self.view.release()
+            self.view = None
+        if getattr(self, "map", None) is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass  # Record views still alive; unmapped when they are collected
+            self.map = None
+        self.file.close()
+
+# Upper bucket edges (us) of the inter-arrival jitter histogram; the last
+# bucket collects everything larger
+JITTER_BUCKETS_US = (10, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class ReadStats:
+    """
+    Running counters for the read loop.
+
+    record_report() is called once per report and only does a few integer
+    operations. Jitter is the distance between an inter-arrival time and
+    the endpoint's polling interval; a gap of more than 1.5 intervals is
+    counted as the reports that should have arrived in it (inferred drops).
+    A gap in which a read timed out is a device with nothing to report,
+    not lost reports, so it is left out of the jitter, max gap and drop
+    figures; this keeps idle periods of pads that only report on change
+    from counting as drops. Time spent disconnected is tracked separately
+    as downtime and is not counted as drops.
+    """
+
+    def __init__(self, expected_interval_ns=None):
+        self.expected_interval_ns = expected_interval_ns
+        self.reports = 0
+        self.timeouts = 0
+        self.usb_errors = 0
+        self.inferred_drops = 0
+        self.first_ns = None
+        self.last_ns = None
+        self.skip_gap = False  # The current gap is idle time or downtime, not drops
+        self.max_gap_ns = 0
+        self.jitter_histogram = [0] * (len(JITTER_BUCKETS_US) + 1)
+        self.window_start_ns = None
+        self.window_reports = 0
+        self.report_rate = 0.0  # Reports/s over the last full second
+        self.disconnects = 0
+        self.disconnected_ns = None  # Set while the device is missing
+        self.downtime_ns = 0
+        self.last_downtime_ns = 0
+
+    def record_report(self, timestamp_ns):
+        last_ns = self.last_ns
+        self.last_ns = timestamp_ns
+        self.reports += 1
+        if last_ns is None:
+            self.first_ns = self.window_start_ns = timestamp_ns
+            return
+
+        if self.skip_gap:
+            self.skip_gap = False
+        else:
+            gap = timestamp_ns - last_ns
+            if gap > self.max_gap_ns:
+                self.max_gap_ns = gap
+            expected = self.expected_interval_ns
+            if expected:
+                jitter_us = abs(gap - expected) // 1000
+                self.jitter_histogram[bisect.bisect_left(JITTER_BUCKETS_US, jitter_us)] += 1
+                if gap * 2 > expected * 3:
+                    self.inferred_drops += (gap + expected // 2) // expected - 1
+
+        self.window_reports += 1
+        elapsed = timestamp_ns - self.window_start_ns
+        if elapsed >= 1_000_000_000:
+            self.report_rate = self.window_reports * 1e9 / elapsed
+            self.window_start_ns = timestamp_ns
+            self.window_reports = 0
+
+    def record_timeout(self):
+        """Count a read that timed out without a report"""
+        self.timeouts += 1
+        self.skip_gap = True
+
+    def record_disconnect(self, timestamp_ns):
+        """Mark the device as gone; the outage is not counted as a gap"""
+        self.disconnects += 1
+        self.disconnected_ns = timestamp_ns
+        self.skip_gap = True
+
+    def record_reconnect(self, timestamp_ns):
+        """Mark the device as back and return how long it was gone (ns)"""
+        downtime = timestamp_ns - self.disconnected_ns
+        self.disconnected_ns = None
+        self.downtime_ns += downtime
+        self.last_downtime_ns = downtime
+        return downtime
+
+    def snapshot(self):
+        """Current counters as a plain dict"""
+        elapsed_ns = (self.last_ns - self.first_ns) if self.reports > 1 else 0
+        histogram = {}
+        lower = 0
+        for upper, count in zip(JITTER_BUCKETS_US, self.jitter_histogram):
+            histogram[f"{lower}-{upper}us"] = count
+            lower = upper
+        histogram[f">{lower}us"] = self.jitter_histogram[-1]
+        return {
+            "reports": self.reports,
+            "report_rate": self.report_rate,
+            "average_rate": (self.reports - 1) * 1e9 / elapsed_ns if elapsed_ns else 0.0,
+            "expected_rate": 1e9 / self.expected_interval_ns if self.expected_interval_ns else None,
+            "max_gap_ms": self.max_gap_ns / 1e6,
+            "timeouts": self.timeouts,
+            "usb_errors": self.usb_errors,
+            "inferred_drops": self.inferred_drops,
+            "connected": self.disconnected_ns is None,
+            "disconnects": self.disconnects,
+            "downtime_s": self.downtime_ns / 1e9,
+            "last_downtime_s": self.last_downtime_ns / 1e9,
+            "jitter_histogram": histogram,
+        }
+
+    def format(self):
+        """Human readable summary lines"""
+        snap = self.snapshot()
+        expected = (f"{snap['expected_rate']:.0f}/s" if snap["expected_rate"]
+                    else "unknown")
+        lines = [
+            f"Reports: {snap['reports']} "
+            f"(last second {snap['report_rate']:.1f}/s, average {snap['average_rate']:.1f}/s, "
+            f"expected {expected})",
+            f"Timeouts: {snap['timeouts']}  USB errors: {snap['usb_errors']}  "
+            f"Inferred drops: {snap['inferred_drops']}  Max gap: {snap['max_gap_ms']:.2f} ms",
+        ]
+        if snap["disconnects"]:
+            lines.append(f"Disconnects: {snap['disconnects']}  Downtime: {snap['downtime_s']:.3f} s "
+                         f"(last {snap['last_downtime_s']:.3f} s)")
+        lines.append("Jitter histogram:")
+        for bucket, count in snap["jitter_histogram"].items():
+            lines.append(f"  {bucket:>12s} {count}")
+        return lines
+
+# Upper bucket edges (s) of the processing latency histogram
+PROCESSING_LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3,
+                              5e-3, 1e-2, 2.5e-2, 5e-2, 1e-1)
+
+class MetricsExporter:
+    """
+    Serve reader metrics in Prometheus text format over HTTP on localhost.
+
+    The read loop calls observe() once the processing chain (decoding,
+    filters, display and the other outputs) has handled a report. It adds
+    the time since the USB read returned to the processing latency
+    histogram (with --threaded this includes the wait in the ring) and
+    keeps a reference to the raw report. Decoding it for the button/axis
+    gauges and all formatting happen on the HTTP server thread when
+    scraped.
+    """
+
+    def __init__(self, reader, port=9464, host="127.0.0.1"):
+        self.reader = reader
+        self.host = host
+        self.port = port
+        self.latest = None  # Newest raw report, decoded on scrape
+        self.latency_buckets = [0] * (len(PROCESSING_LATENCY_BUCKETS) + 1)
+        self.latency_sum_ns = 0
+        self.latency_count = 0
+        self.server = None
+        self.thread = None
+
+    def observe(self, timestamp_ns, data):
+        latency_ns = time.monotonic_ns() - timestamp_ns
+        self.latency_buckets[bisect.bisect_left(PROCESSING_LATENCY_BUCKETS, latency_ns / 1e9)] += 1
+        self.latency_sum_ns += latency_ns
+        self.latency_count += 1
+        self.latest = data
+
+    def render(self):
+        """Current metrics in Prometheus text exposition format"""
+        stats = self.reader.stats
+        lines = [
+            "# HELP gamepad_reports_total Reports read from the device.",
+            "# TYPE gamepad_reports_total counter",
+            f"gamepad_reports_total {stats.reports}",
+            "# HELP gamepad_report_rate Reports per second over the last full second.",
+            "# TYPE gamepad_report_rate gauge",
+            f"gamepad_report_rate {stats.report_rate:.3f}",
+            "# HELP gamepad_read_timeouts_total Endpoint reads that timed out.",
+            "# TYPE gamepad_read_timeouts_total counter",
+            f"gamepad_read_timeouts_total {stats.timeouts}",
+            "# HELP gamepad_usb_errors_total USB errors raised by endpoint reads.",
+            "# TYPE gamepad_usb_errors_total counter",
+            f"gamepad_usb_errors_total {stats.usb_errors}",
+            "# HELP gamepad_inferred_drops_total Reports missing from gaps longer than the polling interval.",
+            "# TYPE gamepad_inferred_drops_total counter",
+            f"gamepad_inferred_drops_total {stats.inferred_drops}",
+            "# HELP gamepad_connected 1 while the device is attached, 0 while waiting for it to return.",
+            "# TYPE gamepad_connected gauge",
+            f"gamepad_connected {int(stats.disconnected_ns is None)}",
+            "# HELP gamepad_disconnects_total Times the device disappeared while streaming.",
+            "# TYPE gamepad_disconnects_total counter",
+            f"gamepad_disconnects_total {stats.disconnects}",
+            "# HELP gamepad_downtime_seconds_total Time spent waiting for the device to reconnect.",
+            "# TYPE gamepad_downtime_seconds_total counter",
+            f"gamepad_downtime_seconds_total {stats.downtime_ns / 1e9:.6f}",
+            "# HELP gamepad_last_downtime_seconds Duration of the most recent outage.",
+            "# TYPE gamepad_last_downtime_seconds gauge",
+            f"gamepad_last_downtime_seconds {stats.last_downtime_ns / 1e9:.6f}",
+            "# HELP gamepad_processing_latency_seconds Time from USB read return until the report is decoded and fully processed.",
+            "# TYPE gamepad_processing_latency_seconds histogram",
+        ]
+        cumulative = 0
+        for upper, count in zip(PROCESSING_LATENCY_BUCKETS, self.latency_buckets):
+            cumulative += count
+            lines.append(f'gamepad_processing_latency_seconds_bucket{{le="{upper:g}"}} {cumulative}')
+        cumulative += self.latency_buckets[-1]
+        lines.append(f'gamepad_processing_latency_seconds_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f"gamepad_processing_latency_seconds_sum {self.latency_sum_ns / 1e9:.9f}")
+        lines.append(f"gamepad_processing_latency_seconds_count {cumulative}")
+
+        latest = self.latest
+        state = decode_report(latest) if latest is not None else None
+        if state is not None:
+            lines.append("# HELP gamepad_button_pressed 1 while the button is held.")
+            lines.append("# TYPE gamepad_button_pressed gauge")
+            for mask, name in BUTTON_NAMES + SPECIAL_NAMES:
+                lines.append(f'gamepad_button_pressed{{button="{name}"}} {int(state.is_pressed(mask))}')
+            for mask, name in DPAD_NAMES:
+                lines.append(f'gamepad_button_pressed{{button="{name}"}} {int(bool(state.dpad & mask))}')
+            lines.append("# HELP gamepad_axis_percent Stick position in percent.")
+            lines.append("# TYPE gamepad_axis_percent gauge")
+            for axis in ("left_x", "left_y", "right_x", "right_y"):
+                lines.append(f'gamepad_axis_percent{{axis="{axis}"}} '
+                             f'{axis_percent(getattr(state, axis)):.3f}')
+            lines.append("# HELP gamepad_trigger_level Trigger pressure from 0 to 1.")
+            lines.append("# TYPE gamepad_trigger_level gauge")
+            lines.append(f'gamepad_trigger_level{{trigger="L2"}} {state.l2_level:.4f}')
+            lines.append(f'gamepad_trigger_level{{trigger="R2"}} {state.r2_level:.4f}')
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        """Start serving /metrics from a daemon thread"""
+        exporter = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes off the terminal
+
+        self.server = http.server.HTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name="gamepad-metrics", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+            self.thread = None
+
+def decode_report_bytewise(data, timestamp_ns=None):
+    """
+    Original per-byte decoder into a dict of names, kept as the
+    reference implementation for --benchmark decode
+    """
+    # Crosskey using bit masks (byte 2)
+    DPAD_UP = 0x01
+    DPAD_DOWN = 0x02
+    DPAD_LEFT = 0x04
+    DPAD_RIGHT = 0x08
+    
+    crosskey_byte = data[2] & 0x0F  # Lower 4 bits
+    crosskey_states = []
+    
+    if crosskey_byte & DPAD_UP:
+        crosskey_states.append("Up")
+    if crosskey_byte & DPAD_DOWN:
+        crosskey_states.append("Down")
+    if crosskey_byte & DPAD_LEFT:
+        crosskey_states.append("Left")
+    if crosskey_byte & DPAD_RIGHT:
+        crosskey_states.append("Right")
+
+    # Buttons (bytes 2 and 3)
+    button_map_byte2 = {
+        0x10: "Start",
+        0x20: "Select"
+    }
+    button_map_byte3 = {
+        0x01: "L1",
+        0x02: "R1", 
+        0x04: "Mode",
+        0x10: "A",
+        0x20: "B",
+        0x40: "X", 
+        0x80: "Y"
+    }
+
+    # Analyze buttons
+    buttons_pressed = []
+    for bit, name in button_map_byte2.items():
+        if data[2] & bit:
+            buttons_pressed.append(name)
+    for bit, name in button_map_byte3.items():
+        if data[3] & bit:
+            buttons_pressed.append(name)
+
+    # Additional special buttons
+    special_buttons = []
+    if data[14] & 0x20:
+        special_buttons.append("Turbo")
+    if data[14] & 0x40:
+        special_buttons.append("Clear")
+
+    return {
+        "timestamp_ns": timestamp_ns,
+        "crosskey": crosskey_states,
+        "buttons": buttons_pressed,
+        # Sticks (switch byte order)
+        "left_stick": (interpret_stick_axis(data[7], data[6]),
+                       interpret_stick_axis(data[9], data[8])),
+        "right_stick": (interpret_stick_axis(data[11], data[10]),
+                        interpret_stick_axis(data[13], data[12])),
+        "l2": data[4] / 255,
+        "r2": data[5] / 255,
+        "special": special_buttons,
+    }
+
+# Checked in order before asking ctypes.util.find_library
+LIBUSB_CANDIDATES = (
+    '/opt/homebrew/lib/libusb-1.0.dylib',  # macOS, Homebrew on Apple silicon
+    '/usr/local/lib/libusb-1.0.dylib',  # macOS, Homebrew on Intel
+    '/usr/lib/x86_64-linux-gnu/libusb-1.0.so.0',  # Debian/Ubuntu
+    '/usr/lib/aarch64-linux-gnu/libusb-1.0.so.0',
+    '/usr/lib/arm-linux-gnueabihf/libusb-1.0.so.0',  # Raspberry Pi OS
+    '/usr/lib64/libusb-1.0.so.0',  # Fedora/RHEL
+    '/usr/lib/libusb-1.0.so.0',  # Arch
+    '/usr/local/lib/libusb-1.0.so.0',
+)
+
+LIBUSB_CACHE_FILE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "usb-gamepad-reader", "libusb-path")
+
+def _libusb_loadable(path):
+    if os.path.isabs(path):
+        return os.path.exists(path)
+    try:
+        ctypes.CDLL(path)  # A bare soname from find_library
+        return True
+    except OSError:
+        return False
+
+def find_libusb():
+    """
+    Locate the libusb-1.0 shared library.
+
+    The result is cached in LIBUSB_CACHE_FILE so later runs skip probing
+    (find_library can take a noticeable time on Linux). Returns None if
+    libusb is not installed.
+    """
+    try:
+        with open(LIBUSB_CACHE_FILE) as f:
+            cached = f.read().strip()
+        if cached and _libusb_loadable(cached):
+            return cached
+    except OSError:
+        pass
+
+    path = next((p for p in LIBUSB_CANDIDATES if os.path.exists(p)), None)
+    if path is None:
+        path = ctypes.util.find_library("usb-1.0")
+    if path is None:
+        return None
+
+    try:
+        os.makedirs(os.path.dirname(LIBUSB_CACHE_FILE), exist_ok=True)
+        with open(LIBUSB_CACHE_FILE, "w") as f:
+            f.write(path + "\n")
+    except OSError:
+        pass  # Caching is only an optimisation
+    return path
+
+def endpoint_interval_ns(endpoint, speed=None):
+    """Polling interval of an interrupt endpoint from its bInterval"""
+    if speed is not None and speed >= usb.util.SPEED_HIGH:
+        return 125_000 << (max(1, endpoint.bInterval) - 1)  # 2^(n-1) microframes
+    return max(1, endpoint.bInterval) * 1_000_000  # Frames of 1 ms
+
+class GamePadReader:
+    def __init__(self, poll_interval=0.1, backend=None):
         self.vendor_id = 0x045e  # Microsoft Corporation
         self.product_id = 0x028e  # Controller
         self.device = None
         self.endpoint = None
+        self.interface_number = 0
+        self.poll_interval = poll_interval  # Max time (s) a single read may block
+        self.running = True  # Cleared by stop(); re-armed only by callers, never by a read loop
+        self._state_stream = None
+        self.replay = None  # CaptureReplay used instead of the device
+        self.input_device = None  # LinuxInputDevice used instead of libusb
+        self.replay_speed = 1.0
+        self.rescan_interval = 0.25  # Seconds between bus scans while reconnecting
+        self.stats = ReadStats()
         
-        # Find libusb on macOS
-        lib_path = '/opt/homebrew/lib/libusb-1.0.dylib'
-        if os.path.exists(lib_path):
+        if backend is not None:
+            self.backend = backend  # E.g. SimulatedBackend
+            return
+
+        self.backend = None
+        lib_path = find_libusb()
+        if lib_path:
             print(f"Found libusb at: {lib_path}")
             self.backend = libusb1.get_backend(find_library=lambda x: lib_path)
-        else:
-            print("Could not find libusb library!")
-            self.backend = None
+        if self.backend is None:
+            if UsbfsBackend.available():
+                print("Could not find libusb library, using Linux usbfs directly")
+                self.backend = UsbfsBackend()
+            else:
+                print("Could not find libusb library!")
 
     def find_device(self):
         """Find our specific gamepad"""
@@ -43,6 +1387,38 @@ class GamePadReader:
         print("\nDevice found!")
         return True
 
+    def find_all_devices(self):
+        """Return every attached gamepad matching our vendor/product id"""
+        if not self.backend:
+            print("No USB backend available!")
+            return []
+        return list(usb.core.find(find_all=True, idVendor=self.vendor_id,
+                                  idProduct=self.product_id, backend=self.backend))
+
+    @property
+    def device_id(self):
+        """Stable per-device id derived from bus and address, e.g. 001:005"""
+        if self.device is None:
+            return None
+        return f"{self.device.bus:03d}:{self.device.address:03d}"
+
+    def calibration_key(self):
+        """
+        Key of this device's calibration profile: its serial number when it
+        has one, otherwise its bus and port path (stable across re-plugging
+        into the same port, unlike the address)
+        """
+        if self.device is None:
+            return None
+        prefix = f"{self.device.idVendor:04x}:{self.device.idProduct:04x}"
+        if self.device.iSerialNumber:
+            try:
+                return f"{prefix}/serial-{usb.util.get_string(self.device, self.device.iSerialNumber)}"
+            except (usb.core.USBError, ValueError, NotImplementedError):
+                pass  # Fall back to the port
+        ports = ".".join(map(str, self.device.port_numbers or ())) or str(self.device.address)
+        return f"{prefix}/bus{self.device.bus}-{ports}"
+
     def setup_device(self):
         """Setup the device for communication"""
         if self.device is None:
@@ -70,6 +1446,9 @@ class GamePadReader:
                     if (usb.util.endpoint_direction(ep.bEndpointAddress) == usb.util.ENDPOINT_IN and 
                         ep.bmAttributes & 0x03 == usb.util.ENDPOINT_TYPE_INTR):
                         self.endpoint = ep
+                        self.interface_number = intf.bInterfaceNumber
+                        self.stats.expected_interval_ns = endpoint_interval_ns(
+                            ep, self.device.speed)
                         print("  Using this endpoint for input")
             
             if not self.endpoint:
@@ -93,161 +1472,1996 @@ class GamePadReader:
         if not data:
             return
 
-        # Clear screen and print raw data for reference
         print("\033[2J\033[H")  # Clear screen
-        print("Raw data:", ' '.join([f"{x:02x}" for x in data]))
-        print("-" * 60)
-
         try:
-            # Crosskey using bit masks (byte 2)
-            DPAD_UP = 0x01
-            DPAD_DOWN = 0x02
-            DPAD_LEFT = 0x04
-            DPAD_RIGHT = 0x08
-            
-            crosskey_byte = data[2] & 0x0F  # Lower 4 bits
-            crosskey_states = []
-            
-            if crosskey_byte & DPAD_UP:
-                crosskey_states.append("Up")
-            if crosskey_byte & DPAD_DOWN:
-                crosskey_states.append("Down")
-            if crosskey_byte & DPAD_LEFT:
-                crosskey_states.append("Left")
-            if crosskey_byte & DPAD_RIGHT:
-                crosskey_states.append("Right")
-                
-            if crosskey_states:
-                print(f"Crosskey: {'-'.join(crosskey_states)}")
-
-            # Buttons (bytes 2 and 3)
-            button_map_byte2 = {
-                0x10: "Start",
-                0x20: "Select"
-            }
-            button_map_byte3 = {
-                0x01: "L1",
-                0x02: "R1", 
-                0x04: "Mode",
-                0x10: "A",
-                0x20: "B",
-                0x40: "X", 
-                0x80: "Y"
-            }
-
-            # Analyze buttons
-            buttons_pressed = []
-            for bit, name in button_map_byte2.items():
-                if data[2] & bit:
-                    buttons_pressed.append(name)
-            for bit, name in button_map_byte3.items():
-                if data[3] & bit:
-                    buttons_pressed.append(name)
-            
-            print("Buttons pressed:", ", ".join(buttons_pressed) if buttons_pressed else "None")
-
-            # Stick interpretation function
-            def interpret_stick_axis(high_byte, low_byte):
-                """
-                Interpret stick axis as signed 16-bit value (big-endian)
-                0x0000 (     0) =   0%
-                0x8000 ( 32768) = 100%
-                0x7FFF (-32767) = -100%
-                """
-                # Combine bytes in big-endian order
-                value = (high_byte << 8) | low_byte
-                
-                # Convert to 16-bit signed integer
-                if value > 32767:  # Convert to negative if high bit is set
-                    value -= 65536
-                
-                # Convert to percentage
-                if value == 0:
-                    return 0
-                elif value > 0:
-                    return (value / 32768) * 100
-                else:
-                    return (value / 32767) * 100
-
-            # Left Stick (switch byte order)
-            left_stick_x = interpret_stick_axis(data[7], data[6])
-            left_stick_y = interpret_stick_axis(data[9], data[8])
-            print(f"Left Stick: X: {left_stick_x:6.1f}% | Y: {left_stick_y:6.1f}%")
-
-            # Right Stick (switch byte order)
-            right_stick_x = interpret_stick_axis(data[11], data[10])
-            right_stick_y = interpret_stick_axis(data[13], data[12])
-            print(f"Right Stick: X: {right_stick_x:6.1f}% | Y: {right_stick_y:6.1f}%")
-
-            # Triggers
-            print(f"L2 Trigger: {data[4]/255:6.1%}")
-            print(f"R2 Trigger: {data[5]/255:6.1%}")
-
-            # Additional special buttons
-            special_buttons = []
-            if data[14] & 0x20:
-                special_buttons.append("Turbo")
-            if data[14] & 0x40:
-                special_buttons.append("Clear")
-            
-            if special_buttons:
-                print("Special Buttons:", ", ".join(special_buttons))
-
+            print("\n".join(format_report_lines(data)))
         except Exception as e:
             print(f"Error processing data: {e}")
             import traceback
             traceback.print_exc()
 
-    def read_input(self):
+    def open_linux_input(self, path=None):
+        """Read through a hidraw/evdev node instead of libusb (Linux only)"""
+        if path is None:
+            path = LinuxInputDevice.find(self.vendor_id, self.product_id)
+            if path is None:
+                print("No hidraw or evdev node found for the device")
+                return False
+        try:
+            self.input_device = LinuxInputDevice(path)
+        except OSError as e:
+            print(f"Could not open {path}: {e.strerror}")
+            return False
+        print(f"Reading {self.input_device.kind} node {path}")
+        return True
+
+    def report_size(self):
+        """Largest report the current source can deliver"""
+        if self.endpoint:
+            return self.endpoint.wMaxPacketSize
+        if self.replay is not None:
+            return self.replay.payload_size
+        return 64
+
+    def open_capture(self, path, speed=1.0):
+        """Read reports from a capture file instead of the device"""
+        try:
+            self.replay = CaptureReplay(path)
+        except (OSError, ValueError) as e:
+            print(f"Could not open capture: {e}")
+            return False
+        self.replay_speed = speed
+        self.vendor_id = self.replay.vendor_id
+        self.product_id = self.replay.product_id
+        print(f"Replaying {len(self.replay)} reports from {path}")
+        return True
+
+    def iter_reports(self, poll_interval=None, timeouts=False):
+        """
+        Yield (timestamp_ns, data) for every report the endpoint delivers.
+
+        Blocks on the interrupt endpoint with no extra sleep, so reports are
+        drained as fast as the device produces them. poll_interval bounds how
+        long one read may block before the loop checks self.running again.
+        With timeouts, a read that timed out yields (timestamp_ns, None).
+        With a capture opened by open_capture(), its records are replayed
+        instead.
+        """
+        stats = self.stats
+        if self.replay is not None:
+            for record in self.replay.replay(self.replay_speed):
+                if not self.running:
+                    break
+                stats.record_report(record[0])
+                yield record
+            return
+
+        if poll_interval is None:
+            poll_interval = self.poll_interval
+
+        if self.input_device is not None:
+            read = self.input_device.read
+            while self.running:
+                try:
+                    records = read(poll_interval)
+                except OSError as e:
+                    stats.usb_errors += 1
+                    raise usb.core.USBError(f"{e.strerror}: {self.input_device.path}",
+                                            errno=e.errno)
+                if not records:
+                    stats.record_timeout()
+                    if timeouts:
+                        yield time.monotonic_ns(), None
+                    continue
+                for record in records:
+                    stats.record_report(record[0])
+                    yield record
+            return
+
+        timeout = max(1, int(poll_interval * 1000))  # pyusb wants milliseconds
+        address = self.endpoint.bEndpointAddress
+        size = self.endpoint.wMaxPacketSize
+        read = self.device.read
+
+        while self.running:
+            try:
+                data = read(address, size, timeout=timeout)
+            except usb.core.USBError as e:
+                # USBTimeoutError, or errno 110 (Operation timed out) from older pyusb
+                if not isinstance(e, usb.core.USBTimeoutError) and e.args[0] != 110:
+                    stats.usb_errors += 1
+                    raise
+                stats.record_timeout()
+                if timeouts:
+                    yield time.monotonic_ns(), None
+                continue  # Normal timeout, just continue
+            if data:
+                timestamp_ns = time.monotonic_ns()
+                stats.record_report(timestamp_ns)
+                yield timestamp_ns, data
+
+    def calibrate(self, center_time=2.0, range_time=8.0):
+        """
+        Sample live input into a Calibration.
+
+        For center_time seconds the sticks and triggers must be left alone,
+        which gives the centers and trigger rest positions; then for
+        range_time seconds the sticks are moved around their full range and
+        the triggers pressed fully, which gives the extremes. A pad that
+        only reports changes may stay silent while centered; its first
+        report of the sweep is then the closest reading of the rest
+        position. Returns None if the device sent no reports.
+        """
+        ring = RawReportRing(report_size=self.report_size())
+        thread = ReportReaderThread(self, ring)
+        self.running = True  # Armed before the thread starts, so an early stop() is kept
+        thread.start()
+        sums = [0] * 4
+        samples = 0
+        rest = [0, 0]
+        lows = [0] * 4
+        highs = [0] * 4
+        trigger_highs = [0, 0]
+        try:
+            for phase, duration in (("center", center_time), ("range", range_time)):
+                if phase == "center":
+                    print(f"Leave both sticks centered and the triggers released ({center_time:g}s)...")
+                else:
+                    if samples:
+                        centers = [round(total / samples) for total in sums]
+                        lows = list(centers)
+                        highs = list(centers)
+                        trigger_highs = list(rest)
+                    print(f"Move both sticks around their full range and fully press "
+                          f"both triggers ({range_time:g}s)...")
+                end = time.monotonic() + duration
+                while time.monotonic() < end and thread.is_alive():
+                    item = ring.pop()
+                    if item is None:
+                        time.sleep(0.001)
+                        continue
+                    state = decode_report(item[1])
+                    if state is None:
+                        continue
+                    axes = (state.left_x, state.left_y, state.right_x, state.right_y)
+                    if phase == "center":
+                        for i in range(4):
+                            sums[i] += axes[i]
+                        samples += 1
+                        rest = [max(rest[0], state.l2), max(rest[1], state.r2)]
+                    else:
+                        if not samples:
+                            # Silent while centered: the sweep starts at rest
+                            sums = list(axes)
+                            samples = 1
+                            rest = [state.l2, state.r2]
+                            lows = list(axes)
+                            highs = list(axes)
+                            trigger_highs = list(rest)
+                        for i in range(4):
+                            lows[i] = min(lows[i], axes[i])
+                            highs[i] = max(highs[i], axes[i])
+                        trigger_highs = [max(trigger_highs[0], state.l2),
+                                         max(trigger_highs[1], state.r2)]
+        finally:
+            thread.stop()
+        if thread.error:
+            raise thread.error
+        if not samples:
+            return None
+
+        centers = [round(total / samples) for total in sums]
+        return Calibration(
+            {axis: (lows[i], centers[i], highs[i]) for i, axis in enumerate(STICK_AXES)},
+            {"l2": (rest[0], trigger_highs[0]), "r2": (rest[1], trigger_highs[1])})
+
+    def stats_snapshot(self):
+        """Report rate, jitter histogram, timeout/error and drop counters"""
+        return self.stats.snapshot()
+
+    def stop(self):
+        """Ask a running acquisition loop to return after its current read"""
+        self.running = False
+
+    def acquire(self, handler, poll_interval=None, transfers=0, reconnect=False, idle=None):
+        """
+        Pass every report to handler(timestamp_ns, data) until stopped.
+
+        idle(timestamp_ns), if given, is called whenever a read times out.
+        With reconnect, a USB error on the device waits for it to come back
+        (see reconnect()) and resumes instead of raising.
+        """
+        while True:
+            try:
+                if transfers > 0 and self.endpoint:
+                    AsyncTransferEngine(self, handler, num_transfers=transfers,
+                                        idle=idle, poll_interval=poll_interval).run()
+                elif idle is None:
+                    for timestamp_ns, data in self.iter_reports(poll_interval):
+                        handler(timestamp_ns, data)
+                else:
+                    for timestamp_ns, data in self.iter_reports(poll_interval, timeouts=True):
+                        if data is None:
+                            idle(timestamp_ns)
+                        else:
+                            handler(timestamp_ns, data)
+                return
+            except usb.core.USBError as e:
+                if not reconnect or self.device is None:
+                    raise
+                print(f"USB Error: {str(e)}")
+                if not self.reconnect():
+                    return
+
+    def reconnect(self):
+        """
+        Wait for the device to reappear and set it up again.
+
+        Rescans the bus every rescan_interval seconds for our vendor/product
+        id, since a re-plugged device usually gets a new address. Returns
+        True once setup_device() succeeds, or False if stop() was called
+        first. The time without a device is recorded in stats.
+        """
+        self.stats.record_disconnect(time.monotonic_ns())
+        try:
+            usb.util.dispose_resources(self.device)
+        except usb.core.USBError:
+            pass
+        self.device = None
+        self.endpoint = None
+        print("Device disconnected, waiting for it to come back...")
+
+        while self.running:
+            time.sleep(self.rescan_interval)
+            try:
+                self.device = usb.core.find(idVendor=self.vendor_id,
+                                            idProduct=self.product_id,
+                                            backend=self.backend)
+            except usb.core.USBError:
+                self.device = None
+            if self.device is not None and self.setup_device():
+                downtime = self.stats.record_reconnect(time.monotonic_ns())
+                print(f"Device reconnected after {downtime / 1e9:.2f}s")
+                return True
+            self.endpoint = None
+        return False
+
+    def iter_changes(self, poll_interval=None):
+        """Yield (state, CHANGED_* flags) only for reports that differ"""
+        change_filter = ChangeFilter()
+        for timestamp_ns, data in self.iter_reports(poll_interval):
+            result = change_filter.feed(timestamp_ns, data)
+            if result is not None:
+                yield result
+
+    def iter_button_events(self, poll_interval=None):
+        """Yield ButtonEvent for every press and release"""
+        detector = ButtonEdgeDetector()
+        for state, changed in self.iter_changes(poll_interval):
+            if changed & (CHANGED_BUTTONS | CHANGED_DPAD):
+                yield from detector.feed(state)
+
+    def states(self, backpressure="drop-oldest", maxsize=64, poll_interval=None, transfers=0):
+        """
+        Async iterator of decoded states for use inside an asyncio loop:
+
+            async for state in reader.states(backpressure="coalesce"):
+                ...
+        """
+        return AsyncStateStream(self, backpressure, maxsize, poll_interval, transfers)
+
+    async def next_state(self, backpressure="coalesce"):
+        """Await the next decoded state from a stream shared across calls"""
+        if self._state_stream is None:
+            self._state_stream = self.states(backpressure)
+        return await self._state_stream.__anext__()
+
+    def read_input(self, poll_interval=None, transfers=0, threaded=False,
+                   changes_only=False, events=False, fps=None, record_path=None,
+                   print_stats=False, metrics_port=None, reconnect=False,
+                   shared_memory_name=None, datagram_address=None, stick_shaper=None,
+                   smoother=None, overwrite_record=False):
         """Read and process input from the gamepad"""
-        if not self.endpoint:
+        if not self.endpoint and self.replay is None and self.input_device is None:
             print("Device not properly set up")
             return
+        if record_path and not overwrite_record and os.path.exists(record_path):
+            print(f"{record_path} already exists; pass --overwrite to replace it")
+            return
+
+        recorder = None
+        if record_path:
+            # Opened before the other sinks, so a bad path leaves nothing to clean up
+            try:
+                recorder = CaptureWriter(record_path, vendor_id=self.vendor_id,
+                                         product_id=self.product_id,
+                                         overwrite=overwrite_record)
+            except OSError as e:
+                print(f"Could not open capture file: {e}")
+                return
+
+        def discard_recording():
+            if recorder:
+                recorder.close()
+                os.remove(record_path)  # Nothing was recorded
 
         print("\nReading input data... Press Ctrl+C to stop.")
+        self.running = True  # Armed before any worker starts, so an early stop() is kept
         
+        renderer = None
+        if events:
+            change_filter = ChangeFilter()
+            detector = ButtonEdgeDetector()
+            start_ns = None
+
+            def handle(timestamp_ns, data):
+                nonlocal start_ns
+                if start_ns is None:
+                    start_ns = timestamp_ns  # Times are relative to the first report
+                if change_filter.feed(timestamp_ns, data) is None:
+                    return
+                for event in detector.feed(change_filter.last_state):
+                    action = "pressed" if event.pressed else "released"
+                    print(f"{(event.timestamp_ns - start_ns) / 1e9:10.4f}s  {event.name} {action}")
+        else:
+            if fps:
+                renderer = TerminalRenderer(fps)
+                render = renderer.update
+            else:
+                render = lambda timestamp_ns, data: self.process_data(data)
+
+            if changes_only:
+                change_filter = ChangeFilter()
+
+                def handle(timestamp_ns, data):
+                    if change_filter.feed(timestamp_ns, data) is not None:
+                        render(timestamp_ns, data)
+            else:
+                handle = render
+
+        publisher = None
+        if shared_memory_name is not None:
+            try:
+                publisher = SharedStatePublisher(shared_memory_name or None)
+            except (OSError, ImportError) as e:  # multiprocessing.shared_memory needs Python 3.8+
+                print(f"Could not create shared memory block: {e}")
+                discard_recording()
+                return
+            print(f"Publishing state to shared memory block {publisher.name}")
+            consume = handle
+
+            def handle(timestamp_ns, data):
+                state = decode_report(data, timestamp_ns)
+                if state is not None:
+                    publisher.publish(state)
+                consume(timestamp_ns, data)
+
+        sender = None
+        if datagram_address is not None:
+            try:
+                sender = StateDatagramSender(datagram_address)
+            except OSError as e:
+                print(f"Could not open datagram socket: {e}")
+                if publisher:
+                    publisher.close()
+                discard_recording()
+                return
+            print(f"Sending changed states to {datagram_address}")
+            sink_filter = ChangeFilter()
+            forward = handle
+
+            def handle(timestamp_ns, data):
+                if sink_filter.feed(timestamp_ns, data) is not None:
+                    sender.send(sink_filter.last_state)
+                    if not threaded:
+                        sender.flush()  # Nothing else is queued behind this report
+                forward(timestamp_ns, data)
+
+        exporter = None
+        if metrics_port is not None:
+            exporter = MetricsExporter(self, metrics_port)
+            try:
+                exporter.start()
+            except OSError as e:
+                print(f"Could not start metrics server: {e}")
+                if publisher:
+                    publisher.close()
+                if sender:
+                    sender.close()
+                discard_recording()
+                return
+            print(f"Serving metrics on http://{exporter.host}:{exporter.port}/metrics")
+
+        if stick_shaper is not None:
+            # Later stages see the shaped sticks; metrics and the recorder see raw reports
+            shaped = handle
+
+            def handle(timestamp_ns, data):
+                shaped(timestamp_ns, stick_shaper.apply_report(data))
+
+        idle = None
+        if smoother is not None:
+            # Smooth raw axes before calibration and the response curve
+            smoothed = handle
+
+            def handle(timestamp_ns, data):
+                smoothed(timestamp_ns, smoother.apply_report(timestamp_ns, data))
+
+            def idle(timestamp_ns):
+                # No reports: let a released stick settle instead of holding its lag
+                data = smoother.settle(timestamp_ns)
+                if data is not None:
+                    smoothed(timestamp_ns, data)
+
+        if recorder:
+            print(f"Recording raw reports to {record_path}")
+            process = handle
+
+            def handle(timestamp_ns, data):
+                recorder.write(timestamp_ns, data)
+                process(timestamp_ns, data)
+
+        if exporter:
+            # Observed after the whole chain, so the latency covers every stage
+            process_report = handle
+
+            def handle(timestamp_ns, data):
+                process_report(timestamp_ns, data)
+                exporter.observe(timestamp_ns, data)
+
+        reader_thread = None
         try:
-            while True:
-                try:
-                    # Read data from the endpoint
-                    data = self.device.read(self.endpoint.bEndpointAddress, 
-                                          self.endpoint.wMaxPacketSize,
-                                          timeout=100)
-                    if data:
-                        self.process_data(data)
-                except usb.core.USBTimeoutError:
-                    continue  # Normal timeout, just continue
-                except usb.core.USBError as e:
-                    if e.args[0] == 110:  # Operation timed out
+            if renderer:
+                renderer.start()
+            if threaded:
+                # Capture on a separate thread so slow rendering can't stall it
+                ring = RawReportRing(report_size=self.report_size())
+                reader_thread = ReportReaderThread(self, ring, poll_interval, transfers,
+                                                   reconnect)
+                reader_thread.start()
+                while reader_thread.is_alive() or len(ring):
+                    item = ring.pop()
+                    if item is None:
+                        if sender:
+                            sender.flush()  # Ring drained; send what queued up
+                        if idle:
+                            idle(time.monotonic_ns())
+                        time.sleep(0.001)
                         continue
-                    else:
-                        print(f"USB Error: {str(e)}")
-                        break
-                
-                time.sleep(0.1)  # Small delay to prevent CPU overload
-                
+                    handle(*item)
+                if reader_thread.error:
+                    raise reader_thread.error
+            else:
+                self.acquire(handle, poll_interval, transfers, reconnect, idle)
+        except usb.core.USBError as e:
+            print(f"USB Error: {str(e)}")
         except KeyboardInterrupt:
             print("\nStopping...")
         finally:
+            self.running = False
+            if exporter:
+                exporter.stop()
+            if publisher:
+                publisher.close()
+            if sender:
+                sender.close()
+                print(f"Sent {sender.sent} states, dropped {sender.dropped}")
+            if renderer:
+                renderer.stop()
+            if recorder:
+                recorder.close()
+                print(f"Recorded {recorder.records} reports to {record_path}")
+            if reader_thread:
+                reader_thread.join()
+                print(f"Ring buffer overruns: {ring.overruns}")
+            if print_stats:
+                print("\n".join(self.stats.format()))
+            if self.input_device:
+                self.input_device.close()
+                self.input_device = None
             # Release the interface
             if self.device:
                 try:
-                    usb.util.release_interface(self.device, 0)
+                    usb.util.release_interface(self.device, self.interface_number)
                 except:
                     pass
 
+class RawReportRing:
+    """
+    Preallocated single-producer/single-consumer ring of raw reports.
+
+    The producer never blocks or allocates: each report is copied into a
+    fixed slot together with its monotonic timestamp. No locks are taken;
+    the producer only advances write_seq and the consumer only advances
+    read_seq, which is safe under the GIL. A consumer that falls a full
+    ring behind skips to the oldest slot the producer is not about to
+    reuse and the number of lost reports is added to overruns.
+    """
+
+    def __init__(self, capacity=1024, report_size=64):
+        self.capacity = capacity
+        self.report_size = report_size
+        self.buffers = [bytearray(report_size) for _ in range(capacity)]
+        self.lengths = [0] * capacity
+        self.timestamps = [0] * capacity
+        self.write_seq = 0
+        self.read_seq = 0
+        self.overruns = 0
+
+    def __len__(self):
+        return min(self.write_seq - self.read_seq, self.capacity - 1)
+
+    def push(self, timestamp_ns, data):
+        """Store one report, overwriting the oldest slot when full"""
+        seq = self.write_seq
+        slot = seq % self.capacity
+        length = min(len(data), self.report_size)
+        self.buffers[slot][:length] = data[:length]
+        self.lengths[slot] = length
+        self.timestamps[slot] = timestamp_ns
+        self.write_seq = seq + 1  # Publish only after the slot is complete
+
+    def pop(self):
+        """Return (timestamp_ns, bytes) for the oldest unread report, or None"""
+        while True:
+            read_seq = self.read_seq
+            write_seq = self.write_seq
+            if read_seq == write_seq:
+                return None
+            if write_seq - read_seq >= self.capacity:
+                # The oldest slot is the next one the producer overwrites
+                skip_to = write_seq - self.capacity + 1
+                self.overruns += skip_to - read_seq
+                read_seq = skip_to
+
+            slot = read_seq % self.capacity
+            timestamp_ns = self.timestamps[slot]
+            data = bytes(self.buffers[slot][:self.lengths[slot]])
+
+            # The producer may have reused this slot while we copied it
+            if self.write_seq - read_seq < self.capacity:
+                self.read_seq = read_seq + 1
+                return timestamp_ns, data
+            self.read_seq = read_seq
+
+class ReportReaderThread(threading.Thread):
+    """Background thread that only moves raw reports into a RawReportRing"""
+
+    def __init__(self, reader, ring, poll_interval=None, transfers=0, reconnect=False):
+        super().__init__(name="gamepad-reader", daemon=True)
+        self.reader = reader
+        self.ring = ring
+        self.poll_interval = poll_interval
+        self.transfers = transfers
+        self.reconnect = reconnect
+        self.error = None
+
+    def run(self):
+        try:
+            self.reader.acquire(self.ring.push, self.poll_interval, self.transfers,
+                                self.reconnect)
+        except usb.core.USBError as e:
+            self.error = e
+
+    def stop(self):
+        """Stop acquisition and wait for the thread to exit"""
+        self.reader.stop()
+        self.join()
+
+class MultiGamepadReader:
+    """
+    Read every matching gamepad at once, one ReportReaderThread per device.
+
+    Each device gets its own GamePadReader and RawReportRing, so adding a
+    pad adds one independent producer. The consumer merges the rings into
+    a single stream ordered by timestamp; reports are held back for
+    reorder_window seconds so a slower thread cannot deliver an earlier
+    report after a later one from another device has been yielded.
+    """
+
+    def __init__(self, poll_interval=0.1, backend=None, reorder_window=0.002):
+        self.poll_interval = poll_interval
+        self.reorder_window = reorder_window
+        self.probe = GamePadReader(poll_interval, backend)  # Resolves the backend once
+        self.backend = self.probe.backend
+        self.readers = []
+        self.running = True  # Cleared by stop(); re-armed by read_input()
+
+    def find_devices(self):
+        """Create one GamePadReader for every attached gamepad"""
+        print(f"Looking for devices (Vendor ID: 0x{self.probe.vendor_id:04x}, "
+              f"Product ID: 0x{self.probe.product_id:04x})...")
+        self.readers = []
+        for device in self.probe.find_all_devices():
+            reader = GamePadReader(self.poll_interval, backend=self.backend)
+            reader.device = device
+            self.readers.append(reader)
+        print(f"\nFound {len(self.readers)} device(s)")
+        return bool(self.readers)
+
+    def setup_devices(self):
+        """Set up every device, dropping the ones that fail"""
+        ready = []
+        for reader in self.readers:
+            if reader.setup_device():
+                ready.append(reader)
+            else:
+                print(f"Skipping device {reader.device_id}")
+        self.readers = ready
+        return bool(ready)
+
+    def iter_reports(self, poll_interval=None):
+        """Yield (device_id, timestamp_ns, data) from all devices in time order"""
+        workers = []
+        for reader in self.readers:
+            ring = RawReportRing(report_size=reader.report_size())
+            thread = ReportReaderThread(reader, ring, poll_interval)
+            thread.name = f"gamepad-reader-{reader.device_id}"
+            workers.append((reader.device_id, ring, thread))
+            thread.start()
+
+        window_ns = int(self.reorder_window * 1e9)
+        pending = []  # Heap of (timestamp_ns, seq, device_id, data)
+        seq = 0
+        failed = set()
+        try:
+            while self.running:
+                alive = False
+                for device_id, ring, thread in workers:
+                    alive = alive or thread.is_alive()
+                    if thread.error and device_id not in failed:
+                        failed.add(device_id)
+                        print(f"USB Error on device {device_id}: {thread.error}")
+                    item = ring.pop()
+                    while item is not None:
+                        heapq.heappush(pending, (item[0], seq, device_id, item[1]))
+                        seq += 1
+                        item = ring.pop()
+
+                if not alive:
+                    horizon = float("inf")  # Every producer is done; flush
+                else:
+                    horizon = time.monotonic_ns() - window_ns
+                if pending and pending[0][0] <= horizon:
+                    while pending and pending[0][0] <= horizon:
+                        timestamp_ns, _, device_id, data = heapq.heappop(pending)
+                        yield device_id, timestamp_ns, data
+                elif not alive:
+                    break
+                else:
+                    time.sleep(0.0005)
+        finally:
+            self.running = False
+            for reader in self.readers:
+                reader.stop()
+            for _, ring, thread in workers:
+                thread.join()
+                if ring.overruns:
+                    print(f"Ring buffer overruns: {ring.overruns}")
+
+    def iter_events(self, poll_interval=None):
+        """Yield (device_id, ButtonEvent) merged across all devices"""
+        detectors = {}
+        for device_id, timestamp_ns, data in self.iter_reports(poll_interval):
+            if device_id not in detectors:
+                detectors[device_id] = (ChangeFilter(), ButtonEdgeDetector())
+            change_filter, detector = detectors[device_id]
+            if change_filter.feed(timestamp_ns, data) is None:
+                continue
+            for event in detector.feed(change_filter.last_state):
+                yield device_id, event
+
+    def stop(self):
+        """Stop every device's acquisition loop"""
+        self.running = False
+        for reader in self.readers:
+            reader.stop()
+
+    def read_input(self, poll_interval=None, print_stats=False):
+        """Print button events from all devices, tagged with their id"""
+        print(f"\nReading input from {len(self.readers)} device(s)... Press Ctrl+C to stop.")
+        self.running = True  # Armed before the reader threads start
+        for reader in self.readers:
+            reader.running = True
+        start_ns = None
+        try:
+            for device_id, event in self.iter_events(poll_interval):
+                if start_ns is None:
+                    start_ns = event.timestamp_ns  # Times are relative to the first event
+                action = "pressed" if event.pressed else "released"
+                print(f"{(event.timestamp_ns - start_ns) / 1e9:10.4f}s  "
+                      f"[{device_id}] {event.name} {action}")
+        except KeyboardInterrupt:
+            print("\nStopping...")
+        finally:
+            self.stop()
+            for reader in self.readers:
+                if print_stats:
+                    print(f"\nDevice {reader.device_id}:")
+                    print("\n".join(reader.stats.format()))
+                try:
+                    usb.util.release_interface(reader.device, reader.interface_number)
+                except:
+                    pass
+
+class AsyncStateStream:
+    """
+    Async iterator that feeds decoded states into an asyncio event loop.
+
+    USB reads and decoding run on a background thread; states are handed
+    to the loop with call_soon_threadsafe so the loop never blocks on the
+    device. When the consumer falls behind, backpressure decides what
+    happens:
+
+    - "drop-oldest": keep the newest maxsize states, count the rest in dropped
+    - "block": pause the reader thread until the consumer catches up
+    - "coalesce": keep only the most recent state
+    """
+
+    BACKPRESSURE_MODES = ("drop-oldest", "block", "coalesce")
+
+    def __init__(self, reader, backpressure="drop-oldest", maxsize=64,
+                 poll_interval=None, transfers=0):
+        if backpressure not in self.BACKPRESSURE_MODES:
+            raise ValueError(f"Unknown backpressure mode: {backpressure!r}")
+        self.reader = reader
+        self.backpressure = backpressure
+        self.maxsize = maxsize
+        self.poll_interval = poll_interval
+        self.transfers = transfers
+        self.queue = collections.deque()
+        self.space = threading.Semaphore(maxsize)
+        self.dropped = 0
+        self.error = None
+        self.finished = False
+        self.loop = None
+        self.thread = None
+        self.waiter = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.thread is None:
+            self._start()
+
+        while not self.queue:
+            if self.finished:
+                if self.error:
+                    raise self.error
+                raise StopAsyncIteration
+            self.waiter = self.loop.create_future()
+            try:
+                await self.waiter
+            finally:
+                self.waiter = None
+
+        state = self.queue.popleft()
+        if self.backpressure == "block":
+            self.space.release()
+        return state
+
+    def _start(self):
+        self.loop = asyncio.get_running_loop()
+        self.reader.running = True  # Armed before the thread starts, so aclose() is never lost
+        self.thread = threading.Thread(target=self._run, name="gamepad-states", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        """Reader thread: acquire, decode and hand states to the loop"""
+        try:
+            self.reader.acquire(self._on_report, self.poll_interval, self.transfers)
+        except usb.core.USBError as e:
+            self.error = e
+        finally:
+            self._call_in_loop(self._finish)
+
+    def _on_report(self, timestamp_ns, data):
+        state = decode_report(data, timestamp_ns)
+        if state is None:
+            return
+        if self.backpressure == "block":
+            # Wait for room, but keep noticing stop requests
+            while not self.space.acquire(timeout=self.reader.poll_interval):
+                if not self.reader.running:
+                    return
+        self._call_in_loop(self._deliver, state)
+
+    def _call_in_loop(self, callback, *args):
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            self.reader.stop()  # Event loop already closed
+
+    def _deliver(self, state):
+        if self.backpressure == "coalesce":
+            self.dropped += len(self.queue)
+            self.queue.clear()
+        elif self.backpressure == "drop-oldest" and len(self.queue) >= self.maxsize:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(state)
+        self._wake()
+
+    def _finish(self):
+        self.finished = True
+        self._wake()
+
+    def _wake(self):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def aclose(self):
+        """Stop the reader thread and wait for it to exit"""
+        self.reader.stop()
+        if self.thread is not None:
+            await self.loop.run_in_executor(None, self.thread.join)
+
+class AsyncTransferEngine:
+    """
+    Keep several interrupt IN transfers queued on the reader's endpoint.
+
+    Uses libusb's asynchronous API through python-libusb1, so the host
+    controller always has a transfer to complete while we decode the
+    previous one. Each completed buffer is passed to handler(timestamp_ns,
+    data) and the transfer is resubmitted from its completion callback.
+    Transfers time out after poll_interval seconds without a report, so
+    idle gaps are counted as timeouts rather than drops; idle(timestamp_ns),
+    if given, is called for each of them.
+    """
+
+    def __init__(self, reader, handler, num_transfers=8, idle=None, poll_interval=None):
+        self.reader = reader
+        self.handler = handler
+        self.idle = idle
+        self.poll_interval = reader.poll_interval if poll_interval is None else poll_interval
+        self.num_transfers = num_transfers
+        self.context = None
+        self.handle = None
+        self.transfers = []
+        self.running = False
+        self.error = None
+
+    def open(self):
+        """Open the device found by the reader through libusb1"""
+        if usb1 is None:
+            print("python-libusb1 is not installed (pip install libusb1)")
+            return False
+
+        self.context = usb1.USBContext()
+        for dev in self.context.getDeviceIterator(skip_on_error=True):
+            if (dev.getBusNumber() == self.reader.device.bus and
+                    dev.getDeviceAddress() == self.reader.device.address):
+                self.handle = dev.open()
+                break
+            dev.close()
+
+        if self.handle is None:
+            print("Could not open device through libusb1")
+            self.context.close()
+            self.context = None
+            return False
+
+        try:
+            self.handle.setAutoDetachKernelDriver(True)
+        except usb1.USBError:
+            pass  # Not supported on every platform
+        self.handle.claimInterface(self.reader.interface_number)
+        self._allocate_transfers()
+        return True
+
+    def _allocate_transfers(self):
+        address = self.reader.endpoint.bEndpointAddress
+        size = self.reader.endpoint.wMaxPacketSize
+        timeout = max(1, int(self.poll_interval * 1000))  # libusb wants milliseconds
+        for _ in range(self.num_transfers):
+            transfer = self.handle.getTransfer()
+            transfer.setInterrupt(address, size, callback=self._on_complete, timeout=timeout)
+            self.transfers.append(transfer)
+
+    def _on_complete(self, transfer):
+        status = transfer.getStatus()
+        if status == usb1.TRANSFER_COMPLETED:
+            length = transfer.getActualLength()
+            if length:
+                timestamp_ns = time.monotonic_ns()
+                self.reader.stats.record_report(timestamp_ns)
+                self.handler(timestamp_ns, transfer.getBuffer()[:length])
+        elif status == usb1.TRANSFER_TIMED_OUT:
+            self.reader.stats.record_timeout()
+            if self.idle is not None:
+                self.idle(time.monotonic_ns())
+        elif status in (usb1.TRANSFER_NO_DEVICE, usb1.TRANSFER_ERROR):
+            self.reader.stats.usb_errors += 1
+            self.error = status
+            self.running = False
+            return
+        elif status == usb1.TRANSFER_CANCELLED:
+            return
+
+        if self.running:
+            transfer.submit()
+
+    def run(self):
+        """Submit all transfers and handle libusb events until stopped"""
+        if self.handle is None and not self.open():
+            return
+
+        self.running = True
+        try:
+            for transfer in self.transfers:
+                transfer.submit()
+            while self.running and self.reader.running:
+                self.context.handleEventsTimeout(tv=self.poll_interval)
+        finally:
+            self.running = False
+            self.close()
+
+        if self.error is not None:
+            raise usb.core.USBError(f"Transfer failed with status {self.error}")
+
+    def stop(self):
+        """Ask run() to cancel outstanding transfers and return"""
+        self.running = False
+
+    def close(self):
+        """Cancel in-flight transfers and release the libusb1 handle"""
+        if self.handle is None:
+            return
+        for transfer in self.transfers:
+            if transfer.isSubmitted():
+                try:
+                    transfer.cancel()
+                except usb1.USBError:
+                    pass
+        while any(t.isSubmitted() for t in self.transfers):
+            self.context.handleEventsTimeout(tv=0.1)
+        try:
+            self.handle.releaseInterface(self.reader.interface_number)
+        except usb1.USBError:
+            pass
+        self.handle.close()
+        self.context.close()
+        self.handle = None
+        self.context = None
+        self.transfers = []
+
+class _Descriptor:
+    """Plain attribute holder for the descriptors pyusb reads from a backend"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+class SimulatedGamepad:
+    """
+    One fake controller served by SimulatedBackend.
+
+    Reports come from source, any iterable of report bytes, and are
+    released at rate_hz with Gaussian jitter (standard deviation in
+    seconds). When a reader falls behind, the pad holds its newest report
+    instead of queueing, like the real interrupt endpoint. An exhausted
+    source looks like an unplugged device. serial is served as the serial
+    number string descriptor; pass None for a pad without one.
+    """
+
+    def __init__(self, source, rate_hz=1000, jitter=0.0, bus=1, address=1,
+                 vendor_id=0x045e, product_id=0x028e, serial="SIM0001", seed=None):
+        self.source = iter(source)
+        self.interval = 1 / rate_hz
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.next_due = None
+        self.connected = True
+        self.configuration = 1
+        self.serial = serial
+        self.reports = 0
+        self.released_ns = None
+
+        self.device_descriptor = _Descriptor(
+            bLength=18, bDescriptorType=usb.util.DESC_TYPE_DEVICE, bcdUSB=0x0200,
+            bDeviceClass=0xff, bDeviceSubClass=0xff, bDeviceProtocol=0xff,
+            bMaxPacketSize0=8, idVendor=vendor_id, idProduct=product_id,
+            bcdDevice=0x0114, iManufacturer=0, iProduct=0, iSerialNumber=3 if serial else 0,
+            bNumConfigurations=1, address=address, bus=bus, port_number=address,
+            port_numbers=(address,), speed=2)  # Full speed
+        self.configuration_descriptor = _Descriptor(
+            bLength=9, bDescriptorType=usb.util.DESC_TYPE_CONFIG, wTotalLength=32,
+            bNumInterfaces=1, bConfigurationValue=1, iConfiguration=0,
+            bmAttributes=0xa0, bMaxPower=250, extra_descriptors=[])
+        self.interface_descriptor = _Descriptor(
+            bLength=9, bDescriptorType=usb.util.DESC_TYPE_INTERFACE, bInterfaceNumber=0,
+            bAlternateSetting=0, bNumEndpoints=2, bInterfaceClass=0xff,
+            bInterfaceSubClass=0x5d, bInterfaceProtocol=0x01, iInterface=0,
+            extra_descriptors=[])
+        self.endpoint_descriptors = [
+            _Descriptor(
+                bLength=7, bDescriptorType=usb.util.DESC_TYPE_ENDPOINT,
+                bEndpointAddress=0x81, bmAttributes=usb.util.ENDPOINT_TYPE_INTR,
+                wMaxPacketSize=32, bInterval=max(1, round(self.interval * 1000)),
+                bRefresh=0, bSynchAddress=0, extra_descriptors=[]),
+            _Descriptor(
+                bLength=7, bDescriptorType=usb.util.DESC_TYPE_ENDPOINT,
+                bEndpointAddress=0x01, bmAttributes=usb.util.ENDPOINT_TYPE_INTR,
+                wMaxPacketSize=32, bInterval=8,
+                bRefresh=0, bSynchAddress=0, extra_descriptors=[]),
+        ]
+
+    def read(self, timeout_ms):
+        """Block until the next report is due and return it"""
+        if not self.connected:
+            raise usb.core.USBError("No such device (it may have been disconnected)",
+                                    errno=errno.ENODEV)
+
+        now = time.monotonic()
+        if self.next_due is None or now - self.next_due > self.interval:
+            self.next_due = now  # First read, or the reader fell behind
+        wait = self.next_due - now
+        if timeout_ms and wait > timeout_ms / 1000:
+            time.sleep(timeout_ms / 1000)
+            raise usb.core.USBTimeoutError("Operation timed out", errno=errno.ETIMEDOUT)
+        if wait > 0:
+            time.sleep(wait)
+
+        try:
+            report = next(self.source)
+        except StopIteration:
+            self.connected = False
+            raise usb.core.USBError("No such device (it may have been disconnected)",
+                                    errno=errno.ENODEV)
+
+        delay = self.interval
+        if self.jitter:
+            delay = max(0.0, delay + self.random.gauss(0, self.jitter))
+        self.next_due += delay
+        self.reports += 1
+        self.released_ns = time.monotonic_ns()  # When the host could first see it
+        return report
+
+class SimulatedBackend(usb.backend.IBackend):
+    """
+    pyusb backend serving SimulatedGamepad objects instead of real hardware.
+
+    Presents the same configuration/interface/interrupt endpoint layout as
+    the 0x045e:0x028e pad, so find_device, setup_device and every read path
+    run unchanged. Pass it as GamePadReader(backend=...).
+    """
+
+    def __init__(self, gamepads):
+        self.gamepads = list(gamepads)
+
+    def enumerate_devices(self):
+        return [pad for pad in self.gamepads if pad.connected]
+
+    def get_device_descriptor(self, dev):
+        return dev.device_descriptor
+
+    def get_configuration_descriptor(self, dev, config):
+        if config != 0:
+            raise IndexError("configuration index out of range")
+        return dev.configuration_descriptor
+
+    def get_interface_descriptor(self, dev, intf, alt, config):
+        if config != 0 or intf != 0 or alt != 0:
+            raise IndexError("interface index out of range")
+        return dev.interface_descriptor
+
+    def get_endpoint_descriptor(self, dev, ep, intf, alt, config):
+        if config != 0 or intf != 0 or alt != 0:
+            raise IndexError("interface index out of range")
+        return dev.endpoint_descriptors[ep]
+
+    def open_device(self, dev):
+        if not dev.connected:
+            raise usb.core.USBError("No such device", errno=errno.ENODEV)
+        return dev
+
+    def close_device(self, dev_handle):
+        pass
+
+    def set_configuration(self, dev_handle, config_value):
+        dev_handle.configuration = config_value
+
+    def get_configuration(self, dev_handle):
+        return dev_handle.configuration
+
+    def set_interface_altsetting(self, dev_handle, intf, altsetting):
+        pass
+
+    def claim_interface(self, dev_handle, intf):
+        pass
+
+    def release_interface(self, dev_handle, intf):
+        pass
+
+    def is_kernel_driver_active(self, dev_handle, intf):
+        return False
+
+    def detach_kernel_driver(self, dev_handle, intf):
+        pass
+
+    def attach_kernel_driver(self, dev_handle, intf):
+        pass
+
+    def intr_read(self, dev_handle, ep, intf, buff, timeout):
+        report = dev_handle.read(timeout)
+        length = min(len(report), len(buff))
+        buff[:length] = array.array('B', report[:length])
+        return length
+
+    def intr_write(self, dev_handle, ep, intf, data, timeout):
+        return len(data)  # Rumble/LED commands are accepted and ignored
+
+    def ctrl_transfer(self, dev_handle, bmRequestType, bRequest, wValue, wIndex, data, timeout):
+        """Answer GET_DESCRIPTOR for the language list and the serial number string"""
+        index = wValue & 0xFF
+        if bRequest != 0x06 or wValue >> 8 != usb.util.DESC_TYPE_STRING:
+            raise usb.core.USBError("Pipe error", errno=errno.EPIPE)
+        if index == 0:
+            descriptor = bytes([4, usb.util.DESC_TYPE_STRING, 0x09, 0x04])  # en-US
+        elif index == dev_handle.device_descriptor.iSerialNumber and dev_handle.serial:
+            text = dev_handle.serial.encode("utf-16-le")
+            descriptor = bytes([2 + len(text), usb.util.DESC_TYPE_STRING]) + text
+        else:
+            raise usb.core.USBError("Pipe error", errno=errno.EPIPE)
+        length = min(len(descriptor), len(data))
+        data[:length] = array.array('B', descriptor[:length])
+        return length
+
+# usbdevfs ioctls from <linux/usbdevice_fs.h>
+class _UsbdevfsBulkTransfer(ctypes.Structure):
+    _fields_ = [("ep", ctypes.c_uint), ("len", ctypes.c_uint),
+                ("timeout", ctypes.c_uint), ("data", ctypes.c_void_p)]
+
+class _UsbdevfsIoctl(ctypes.Structure):
+    _fields_ = [("ifno", ctypes.c_int), ("ioctl_code", ctypes.c_int),
+                ("data", ctypes.c_void_p)]
+
+class _UsbdevfsGetDriver(ctypes.Structure):
+    _fields_ = [("interface", ctypes.c_uint), ("driver", ctypes.c_char * 256)]
+
+def _ioc(direction, number, size):
+    return direction << 30 | size << 16 | ord('U') << 8 | number
+
+_IOC_NONE, _IOC_WRITE, _IOC_READ = 0, 1, 2
+USBDEVFS_BULK = _ioc(_IOC_READ | _IOC_WRITE, 2, ctypes.sizeof(_UsbdevfsBulkTransfer))
+USBDEVFS_SETCONFIGURATION = _ioc(_IOC_READ, 5, ctypes.sizeof(ctypes.c_uint))
+USBDEVFS_GETDRIVER = _ioc(_IOC_WRITE, 8, ctypes.sizeof(_UsbdevfsGetDriver))
+USBDEVFS_CLAIMINTERFACE = _ioc(_IOC_READ, 15, ctypes.sizeof(ctypes.c_uint))
+USBDEVFS_RELEASEINTERFACE = _ioc(_IOC_READ, 16, ctypes.sizeof(ctypes.c_uint))
+USBDEVFS_IOCTL = _ioc(_IOC_READ | _IOC_WRITE, 18, ctypes.sizeof(_UsbdevfsIoctl))
+USBDEVFS_DISCONNECT = _ioc(_IOC_NONE, 22, 0)
+USBDEVFS_CONNECT = _ioc(_IOC_NONE, 23, 0)
+
+DEVICE_DESCRIPTOR_STRUCT = struct.Struct("<BBHBBBBHHHBBBB")
+CONFIG_DESCRIPTOR_STRUCT = struct.Struct("<BBHBBBBB")
+INTERFACE_DESCRIPTOR_STRUCT = struct.Struct("<BBBBBBBBB")
+ENDPOINT_DESCRIPTOR_STRUCT = struct.Struct("<BBBBHB")
+
+# sysfs "speed" (Mbit/s) to pyusb SPEED_* values
+SYSFS_SPEEDS = {"1.5": usb.util.SPEED_LOW, "12": usb.util.SPEED_FULL,
+                "480": usb.util.SPEED_HIGH, "5000": usb.util.SPEED_SUPER}
+
+def parse_usb_descriptors(raw):
+    """
+    Parse a device descriptor followed by configuration descriptors (the
+    layout of sysfs "descriptors" files) into pyusb-style descriptor
+    objects. Returns (device, configurations); each configuration has an
+    interfaces list indexed [interface][alternate] of (interface, endpoints).
+    """
+    fields = DEVICE_DESCRIPTOR_STRUCT.unpack_from(raw)
+    device = _Descriptor(**dict(zip((
+        "bLength", "bDescriptorType", "bcdUSB", "bDeviceClass", "bDeviceSubClass",
+        "bDeviceProtocol", "bMaxPacketSize0", "idVendor", "idProduct", "bcdDevice",
+        "iManufacturer", "iProduct", "iSerialNumber", "bNumConfigurations"), fields)))
+
+    configurations = []
+    interface = None
+    offset = device.bLength
+    while offset + 2 <= len(raw):
+        length, descriptor_type = raw[offset], raw[offset + 1]
+        if length < 2 or offset + length > len(raw):
+            break
+        if descriptor_type == usb.util.DESC_TYPE_CONFIG:
+            config = _Descriptor(**dict(zip((
+                "bLength", "bDescriptorType", "wTotalLength", "bNumInterfaces",
+                "bConfigurationValue", "iConfiguration", "bmAttributes", "bMaxPower"),
+                CONFIG_DESCRIPTOR_STRUCT.unpack_from(raw, offset))), extra_descriptors=[])
+            config.interfaces = []
+            configurations.append(config)
+            interface = None
+        elif descriptor_type == usb.util.DESC_TYPE_INTERFACE and configurations:
+            interface = _Descriptor(**dict(zip((
+                "bLength", "bDescriptorType", "bInterfaceNumber", "bAlternateSetting",
+                "bNumEndpoints", "bInterfaceClass", "bInterfaceSubClass",
+                "bInterfaceProtocol", "iInterface"),
+                INTERFACE_DESCRIPTOR_STRUCT.unpack_from(raw, offset))), extra_descriptors=[])
+            interface.endpoints = []
+            config = configurations[-1]
+            if interface.bAlternateSetting == 0 or not config.interfaces:
+                config.interfaces.append([])
+            config.interfaces[-1].append(interface)
+        elif descriptor_type == usb.util.DESC_TYPE_ENDPOINT and interface is not None:
+            endpoint = _Descriptor(**dict(zip((
+                "bLength", "bDescriptorType", "bEndpointAddress", "bmAttributes",
+                "wMaxPacketSize", "bInterval"),
+                ENDPOINT_DESCRIPTOR_STRUCT.unpack_from(raw, offset))),
+                bRefresh=0, bSynchAddress=0, extra_descriptors=[])
+            interface.endpoints.append(endpoint)
+        offset += length
+    return device, configurations
+
+def sysfs_port_numbers(name):
+    """Port chain from a sysfs USB device name, e.g. "1-1.2" -> (1, 2); None for root hubs."""
+    _, _, ports = name.partition("-")
+    if not ports:
+        return None
+    return tuple(int(port) for port in ports.split("."))
+
+class _UsbfsDevice:
+    def __init__(self, sysfs_path, devfs_root):
+        def attr(name):
+            with open(os.path.join(sysfs_path, name)) as f:
+                return f.read().strip()
+
+        with open(os.path.join(sysfs_path, "descriptors"), "rb") as f:
+            raw = f.read()
+        self.sysfs_path = sysfs_path
+        self.descriptor, self.configurations = parse_usb_descriptors(raw)
+        self.descriptor.bus = int(attr("busnum"))
+        self.descriptor.address = int(attr("devnum"))
+        self.descriptor.port_numbers = sysfs_port_numbers(os.path.basename(sysfs_path))
+        self.descriptor.port_number = (self.descriptor.port_numbers or (None,))[-1]
+        self.descriptor.speed = SYSFS_SPEEDS.get(attr("speed"))
+        self.node = os.path.join(devfs_root, f"{self.descriptor.bus:03d}",
+                                 f"{self.descriptor.address:03d}")
+
+class _UsbfsHandle:
+    def __init__(self, device, fd):
+        self.device = device
+        self.fd = fd
+
+class UsbfsBackend(usb.backend.IBackend):
+    """
+    Minimal pyusb backend talking to Linux usbfs directly, used when libusb
+    is not installed.
+
+    Devices are enumerated from sysfs and opened through /dev/bus/usb;
+    only what GamePadReader needs (configuration, interface claiming and
+    interrupt transfers) is implemented.
+    """
+
+    def __init__(self, sysfs_root="/sys/bus/usb/devices", devfs_root="/dev/bus/usb"):
+        self.sysfs_root = sysfs_root
+        self.devfs_root = devfs_root
+
+    @staticmethod
+    def available(sysfs_root="/sys/bus/usb/devices", devfs_root="/dev/bus/usb"):
+        return sys.platform.startswith("linux") and os.path.isdir(sysfs_root) \
+            and os.path.isdir(devfs_root)
+
+    def enumerate_devices(self):
+        try:
+            names = sorted(os.listdir(self.sysfs_root))
+        except OSError:
+            return []
+        for name in names:
+            path = os.path.join(self.sysfs_root, name)
+            if ":" in name or not os.path.exists(os.path.join(path, "descriptors")):
+                continue  # Interfaces, not devices
+            try:
+                yield _UsbfsDevice(path, self.devfs_root)
+            except (OSError, ValueError, struct.error):
+                continue
+
+    def get_device_descriptor(self, dev):
+        return dev.descriptor
+
+    def get_configuration_descriptor(self, dev, config):
+        return dev.configurations[config]
+
+    def get_interface_descriptor(self, dev, intf, alt, config):
+        return dev.configurations[config].interfaces[intf][alt]
+
+    def get_endpoint_descriptor(self, dev, ep, intf, alt, config):
+        return dev.configurations[config].interfaces[intf][alt].endpoints[ep]
+
+    def _ioctl(self, dev_handle, request, arg=0):
+        try:
+            return fcntl.ioctl(dev_handle.fd, request, arg)
+        except OSError as e:
+            if e.errno == errno.ETIMEDOUT:
+                raise usb.core.USBTimeoutError("Operation timed out", errno=e.errno)
+            raise usb.core.USBError(e.strerror, errno=e.errno)
+
+    def open_device(self, dev):
+        try:
+            return _UsbfsHandle(dev, os.open(dev.node, os.O_RDWR))
+        except OSError as e:
+            raise usb.core.USBError(f"{e.strerror}: {dev.node}", errno=e.errno)
+
+    def close_device(self, dev_handle):
+        os.close(dev_handle.fd)
+
+    def get_configuration(self, dev_handle):
+        with open(os.path.join(dev_handle.device.sysfs_path, "bConfigurationValue")) as f:
+            value = f.read().strip()
+        return int(value) if value else 0
+
+    def set_configuration(self, dev_handle, config_value):
+        # Re-selecting the active configuration would fail while drivers are bound
+        if self.get_configuration(dev_handle) != config_value:
+            self._ioctl(dev_handle, USBDEVFS_SETCONFIGURATION, ctypes.c_uint(config_value))
+
+    def is_kernel_driver_active(self, dev_handle, intf):
+        request = _UsbdevfsGetDriver(intf)
+        try:
+            fcntl.ioctl(dev_handle.fd, USBDEVFS_GETDRIVER, request)
+        except OSError as e:
+            if e.errno == errno.ENODATA:
+                return False
+            raise usb.core.USBError(e.strerror, errno=e.errno)
+        return True
+
+    def detach_kernel_driver(self, dev_handle, intf):
+        self._ioctl(dev_handle, USBDEVFS_IOCTL, _UsbdevfsIoctl(intf, USBDEVFS_DISCONNECT, None))
+
+    def attach_kernel_driver(self, dev_handle, intf):
+        self._ioctl(dev_handle, USBDEVFS_IOCTL, _UsbdevfsIoctl(intf, USBDEVFS_CONNECT, None))
+
+    def claim_interface(self, dev_handle, intf):
+        if self.is_kernel_driver_active(dev_handle, intf):
+            self.detach_kernel_driver(dev_handle, intf)  # e.g. xpad
+        self._ioctl(dev_handle, USBDEVFS_CLAIMINTERFACE, ctypes.c_uint(intf))
+
+    def release_interface(self, dev_handle, intf):
+        self._ioctl(dev_handle, USBDEVFS_RELEASEINTERFACE, ctypes.c_uint(intf))
+
+    def set_interface_altsetting(self, dev_handle, intf, altsetting):
+        if altsetting != 0:
+            raise usb.core.USBError("Alternate settings are not supported", errno=errno.ENOSYS)
+
+    def _transfer(self, dev_handle, ep, buffer, length, timeout):
+        transfer = _UsbdevfsBulkTransfer(ep, length, timeout, ctypes.addressof(buffer))
+        return self._ioctl(dev_handle, USBDEVFS_BULK, transfer)
+
+    def intr_read(self, dev_handle, ep, intf, buff, timeout):
+        length = len(buff) * buff.itemsize
+        buffer = (ctypes.c_ubyte * length).from_buffer(buff)
+        return self._transfer(dev_handle, ep, buffer, length, timeout)
+
+    def intr_write(self, dev_handle, ep, intf, data, timeout):
+        buffer = (ctypes.c_ubyte * len(data)).from_buffer_copy(bytes(data))
+        return self._transfer(dev_handle, ep, buffer, len(data), timeout)
+
+# Linux input event constants from <linux/input-event-codes.h>
+EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+SYN_REPORT = 0
+ABS_X, ABS_Y, ABS_Z, ABS_RX, ABS_RY, ABS_RZ = 0x00, 0x01, 0x02, 0x03, 0x04, 0x05
+ABS_HAT0X, ABS_HAT0Y = 0x10, 0x11
+
+INPUT_EVENT_STRUCT = struct.Struct("@llHHi")  # struct input_event
+EVIOCSCLOCKID = 1 << 30 | ctypes.sizeof(ctypes.c_int) << 16 | ord('E') << 8 | 0xa0
+CLOCK_MONOTONIC = 1
+
+# evdev key code -> (report byte, mask), following the xpad driver's mapping
+EVDEV_BUTTONS = {
+    0x13b: (2, 0x10),  # BTN_START
+    0x13a: (2, 0x20),  # BTN_SELECT
+    0x13d: (2, 0x40),  # BTN_THUMBL
+    0x13e: (2, 0x80),  # BTN_THUMBR
+    0x136: (3, 0x01),  # BTN_TL -> L1
+    0x137: (3, 0x02),  # BTN_TR -> R1
+    0x13c: (3, 0x04),  # BTN_MODE
+    0x130: (3, 0x10),  # BTN_A
+    0x131: (3, 0x20),  # BTN_B
+    0x133: (3, 0x40),  # BTN_X
+    0x134: (3, 0x80),  # BTN_Y
+    0x2c0: (2, DPAD_LEFT),  # BTN_TRIGGER_HAPPY1-4 when xpad maps the D-pad to buttons
+    0x2c1: (2, DPAD_RIGHT),
+    0x2c2: (2, DPAD_UP),
+    0x2c3: (2, DPAD_DOWN),
+}
+
+# evdev axis -> (report offset, inverted); xpad reports the Y axes as ~raw
+EVDEV_STICKS = {ABS_X: (6, False), ABS_Y: (8, True), ABS_RX: (10, False), ABS_RY: (12, True)}
+EVDEV_TRIGGERS = {ABS_Z: 4, ABS_RZ: 5}
+
+class LinuxInputDevice:
+    """
+    Read the controller through /dev/hidraw* or /dev/input/event* instead
+    of libusb.
+
+    The kernel driver stays attached, so no detaching and no root are
+    needed, only read access to the node (e.g. membership of the "input"
+    group). hidraw nodes already deliver raw reports. evdev events are
+    folded back into the 20-byte report layout on every SYN_REPORT and
+    stamped with the kernel's CLOCK_MONOTONIC event time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.kind = "hidraw" if os.path.basename(path).startswith("hidraw") else "evdev"
+        self.fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        self.poller = select.epoll()
+        self.poller.register(self.fd, select.EPOLLIN)
+        self.report = bytearray(REPORT_SIZE)
+        self.report[1] = REPORT_SIZE
+        if self.kind == "evdev":
+            try:
+                fcntl.ioctl(self.fd, EVIOCSCLOCKID, ctypes.c_int(CLOCK_MONOTONIC))
+            except OSError:
+                pass  # Older kernels: event times stay on CLOCK_REALTIME
+
+    @staticmethod
+    def find(vendor_id, product_id, sysfs_root="/sys/class"):
+        """Path of a hidraw node for the device, else an evdev node, else None"""
+        hid_id = f"HID_ID=0003:{vendor_id:08X}:{product_id:08X}"
+        hidraw_root = os.path.join(sysfs_root, "hidraw")
+        for name in sorted(os.listdir(hidraw_root)) if os.path.isdir(hidraw_root) else ():
+            try:
+                with open(os.path.join(hidraw_root, name, "device", "uevent")) as f:
+                    if hid_id in f.read().upper():
+                        return os.path.join("/dev", name)
+            except OSError:
+                continue
+
+        input_root = os.path.join(sysfs_root, "input")
+        for name in sorted(os.listdir(input_root)) if os.path.isdir(input_root) else ():
+            if not name.startswith("event"):
+                continue
+            try:
+                id_dir = os.path.join(input_root, name, "device", "id")
+                with open(os.path.join(id_dir, "vendor")) as f:
+                    vendor = int(f.read(), 16)
+                with open(os.path.join(id_dir, "product")) as f:
+                    product = int(f.read(), 16)
+            except (OSError, ValueError):
+                continue
+            if (vendor, product) == (vendor_id, product_id):
+                return os.path.join("/dev/input", name)
+        return None
+
+    def read(self, timeout):
+        """Wait up to timeout seconds; return a list of (timestamp_ns, report)"""
+        if not self.poller.poll(timeout):
+            return []
+        if self.kind == "hidraw":
+            return self._read_hidraw()
+        return self._read_evdev()
+
+    def _read_hidraw(self):
+        reports = []
+        while True:
+            try:
+                data = os.read(self.fd, 64)  # One report per read
+            except BlockingIOError:
+                return reports
+            if not data:
+                return reports
+            reports.append((time.monotonic_ns(), data))
+
+    def _read_evdev(self):
+        reports = []
+        report = self.report
+        while True:
+            try:
+                data = os.read(self.fd, INPUT_EVENT_STRUCT.size * 64)
+            except BlockingIOError:
+                return reports
+            for seconds, microseconds, event_type, code, value in \
+                    INPUT_EVENT_STRUCT.iter_unpack(data):
+                if event_type == EV_SYN and code == SYN_REPORT:
+                    reports.append((seconds * 1_000_000_000 + microseconds * 1000,
+                                    bytes(report)))
+                elif event_type == EV_KEY and code in EVDEV_BUTTONS:
+                    index, mask = EVDEV_BUTTONS[code]
+                    if value:
+                        report[index] |= mask
+                    else:
+                        report[index] &= ~mask
+                elif event_type == EV_ABS:
+                    if code in EVDEV_STICKS:
+                        offset, inverted = EVDEV_STICKS[code]
+                        if inverted:
+                            value = ~value
+                        struct.pack_into("<h", report, offset, max(-32768, min(32767, value)))
+                    elif code in EVDEV_TRIGGERS:
+                        report[EVDEV_TRIGGERS[code]] = max(0, min(255, value))
+                    elif code == ABS_HAT0X:
+                        report[2] &= ~(DPAD_LEFT | DPAD_RIGHT)
+                        report[2] |= DPAD_LEFT if value < 0 else DPAD_RIGHT if value > 0 else 0
+                    elif code == ABS_HAT0Y:
+                        report[2] &= ~(DPAD_UP | DPAD_DOWN)
+                        report[2] |= DPAD_UP if value < 0 else DPAD_DOWN if value > 0 else 0
+
+    def close(self):
+        self.poller.close()
+        os.close(self.fd)
+
+def synthetic_reports(seed=None):
+    """Endless reports with sweeping sticks and triggers and cycling buttons"""
+    rng = random.Random(seed)
+    buttons = [mask for mask, _ in BUTTON_NAMES]
+    report = bytearray(REPORT_SIZE)
+    report[1] = REPORT_SIZE
+    step = 0
+    while True:
+        phase = step / 500
+        byte2 = 1 << (step // 250 % 4)  # D-pad
+        held = buttons[step // 100 % len(buttons)]
+        report[2] = byte2 | (held >> 8 & 0xF0)
+        report[3] = held & 0xFF
+        report[4] = int(127.5 + 127.5 * math.sin(phase))
+        report[5] = int(127.5 + 127.5 * math.cos(phase))
+        axes = (math.sin(phase), math.cos(phase), math.sin(phase * 0.7), math.cos(phase * 1.3))
+        for offset, value in zip((6, 8, 10, 12), axes):
+            noise = rng.randint(-64, 64)
+            struct.pack_into("<h", report, offset,
+                             max(-32768, min(32767, int(value * 32000) + noise)))
+        yield bytes(report)
+        step += 1
+
+def load_report_script(path):
+    """
+    Read a report script: one report per line as hex bytes, optionally
+    followed by "* N" to repeat it N times. Blank lines and # comments are
+    ignored.
+    """
+    reports = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            repeat = 1
+            if "*" in line:
+                line, count = line.rsplit("*", 1)
+                repeat = int(count)
+            try:
+                report = bytes.fromhex(line)
+            except ValueError:
+                raise ValueError(f"{path}:{line_number}: invalid hex report")
+            reports.extend([report] * repeat)
+    return reports
+
+def simulated_reports(source, seed=None):
+    """
+    Reports for a --simulate source: "synthetic", a capture file written
+    with --record, or a report script
+    """
+    if source == "synthetic":
+        return synthetic_reports(seed)
+    with open(source, "rb") as f:
+        is_capture = f.read(len(CAPTURE_MAGIC)) == CAPTURE_MAGIC
+    if is_capture:
+        with CaptureReplay(source) as replay:
+            return [bytes(report) for _, report in replay.records()]
+    return load_report_script(source)
+
+# Idle report with a few buttons held and both sticks deflected
+BENCHMARK_REPORT = bytes([0x00, 0x14, 0x11, 0x30, 0x80, 0x00, 0x34, 0x12,
+                          0xcc, 0xed, 0x00, 0x80, 0xff, 0x7f, 0x20, 0x00,
+                          0x00, 0x00, 0x00, 0x00])
+
+def benchmark_decode(number=200000):
+    """Compare reports/s of the per-byte and struct-based decoders"""
+    report = BENCHMARK_REPORT
+    for name, decoder in (("per-byte (before)", decode_report_bytewise),
+                          ("struct (after)", decode_report)):
+        elapsed = min(timeit.repeat(lambda: decoder(report), number=number, repeat=3))
+        print(f"{name:20s} {number / elapsed:12,.0f} reports/s "
+              f"({elapsed / number * 1e9:6.0f} ns/report)")
+
+def benchmark_batch(count=10000):
+    """Compare decoding count buffered reports in a loop vs. one NumPy call"""
+    if np is None:
+        print("NumPy is required for this benchmark (pip install numpy)")
+        return
+
+    rng = random.Random(0)
+    buffer = bytes(rng.getrandbits(8) for _ in range(count * 20))
+    reports = [buffer[i:i + 20] for i in range(0, len(buffer), 20)]
+    reader = GamePadReader.__new__(GamePadReader)  # No USB backend needed
+
+    def loop_process_data():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for report in reports:
+                reader.process_data(report)
+
+    def loop_decode_report():
+        for report in reports:
+            decode_report(report)
+
+    for name, func in (("process_data loop", loop_process_data),
+                       ("decode_report loop", loop_decode_report),
+                       ("decode_reports_batch", lambda: decode_reports_batch(buffer))):
+        elapsed = min(timeit.repeat(func, number=1, repeat=3))
+        print(f"{name:22s} {count / elapsed:14,.0f} reports/s "
+              f"({elapsed * 1000:8.2f} ms for {count})")
+
+LATENCY_RATES = (125, 500, 1000)
+LATENCY_PERCENTILES = (50, 99, 99.9)
+LATENCY_STAGES = ("read", "decode", "dispatch", "render", "total")
+
+def latency_summary(samples_ns):
+    """Mean, percentiles and max of ns samples, in microseconds"""
+    ordered = sorted(samples_ns)
+    summary = {"mean_us": sum(ordered) / len(ordered) / 1000}
+    for q in LATENCY_PERCENTILES:
+        rank = max(1, math.ceil(q / 100 * len(ordered)))  # Nearest-rank
+        summary[f"p{q:g}_us"] = ordered[rank - 1] / 1000
+    summary["max_us"] = ordered[-1] / 1000
+    return summary
+
+def measure_latency(rate_hz, duration):
+    """
+    Per-stage latency of one simulated pad at rate_hz for duration seconds.
+
+    Stages, each timed from the end of the previous one:
+    - read: report released by the device until iter_reports returns it
+    - decode: decode_report
+    - dispatch: button edge detection and the consumer callback
+    - render: one incremental TerminalRenderer frame into a memory buffer
+    total runs from device release to the end of rendering.
+    """
+    pad = SimulatedGamepad(synthetic_reports(seed=0), rate_hz)
+    reader = GamePadReader(backend=SimulatedBackend([pad]))
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not reader.find_device() or not reader.setup_device():
+            raise RuntimeError("Simulated device setup failed")
+
+    detector = ButtonEdgeDetector()
+    renderer = TerminalRenderer(stream=io.StringIO())
+    events = 0
+
+    def consumer(event):
+        nonlocal events
+        events += 1
+
+    samples = {stage: [] for stage in LATENCY_STAGES}
+    end_ns = time.monotonic_ns() + int(duration * 1e9)
+    for timestamp_ns, data in reader.iter_reports():
+        released_ns = pad.released_ns
+        state = decode_report(data, timestamp_ns)
+        decoded_ns = time.monotonic_ns()
+        for event in detector.feed(state):
+            consumer(event)
+        dispatched_ns = time.monotonic_ns()
+        renderer.update(timestamp_ns, data)
+        renderer.draw()
+        rendered_ns = time.monotonic_ns()
+
+        samples["read"].append(timestamp_ns - released_ns)
+        samples["decode"].append(decoded_ns - timestamp_ns)
+        samples["dispatch"].append(dispatched_ns - decoded_ns)
+        samples["render"].append(rendered_ns - dispatched_ns)
+        samples["total"].append(rendered_ns - released_ns)
+        if rendered_ns >= end_ns:
+            break
+    reader.stop()
+
+    return {
+        "reports": len(samples["total"]),
+        "expected_reports": int(rate_hz * duration),
+        "events": events,
+        "stages": {stage: latency_summary(samples[stage]) for stage in LATENCY_STAGES},
+    }
+
+def benchmark_latency(duration=5.0, output="latency-benchmark.json"):
+    """Measure end-to-end latency at each of LATENCY_RATES and save JSON"""
+    results = {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "duration_s": duration,
+        "rates": {},
+    }
+    for rate_hz in LATENCY_RATES:
+        result = measure_latency(rate_hz, duration)
+        results["rates"][str(rate_hz)] = result
+        print(f"\n{rate_hz} Hz: {result['reports']} reports "
+              f"(expected {result['expected_reports']})")
+        print(f"  {'stage':10s}" + "".join(f"{f'p{q:g}':>10s}" for q in LATENCY_PERCENTILES)
+              + f"{'max':>10s}   (us)")
+        for stage, summary in result["stages"].items():
+            print(f"  {stage:10s}" + "".join(f"{summary[f'p{q:g}_us']:10.1f}"
+                                             for q in LATENCY_PERCENTILES)
+                  + f"{summary['max_us']:10.1f}")
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+FILTER_BENCHMARK_SPECS = ("none", "ema:0.5", "ema:0.2", "one-euro:1,0.5", "one-euro:0.5,2")
+
+def filter_response(spec, rate_hz=1000):
+    """
+    Step lag, ramp lag and remaining noise of one axis filter at rate_hz.
+
+    Step lag is the time until the output covers 90% of a jump from rest
+    to full scale; ramp lag is how far behind the output trails a stick
+    moving across its full range in 200 ms; noise is the output's
+    standard deviation on a resting stick with Gaussian jitter of 1% of
+    full scale, relative to the input's.
+    """
+    interval_ns = int(1e9 / rate_hz)
+    smooth = axis_filter(spec) or (lambda value, timestamp_ns: value)
+    timestamps = itertools.count(0, interval_ns)
+
+    for _ in range(100):
+        smooth(0.0, next(timestamps))
+    steps = 0
+    while smooth(1.0, next(timestamps)) < 0.9:
+        steps += 1
+    step_ms = steps * interval_ns / 1e6
+
+    for _ in range(100):
+        smooth(0.0, next(timestamps))
+    ramp_reports = max(1, round(0.2 * rate_hz))
+    for i in range(1, ramp_reports + 1):
+        output = smooth(i / ramp_reports, next(timestamps))
+    ramp_ms = (1.0 - output) * 200
+
+    rng = random.Random(0)
+    inputs = [0.5 + rng.gauss(0, 0.01) for _ in range(5000)]
+    outputs = [smooth(value, next(timestamps)) for value in inputs][1000:]
+    inputs = inputs[1000:]
+
+    def std(values):
+        mean = sum(values) / len(values)
+        return math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+    return step_ms, ramp_ms, std(outputs) / std(inputs)
+
+def benchmark_filter(rate_hz=1000):
+    """CPU cost per report and added lag of the stick smoothing filters"""
+    interval_ns = int(1e9 / rate_hz)
+    count = 100000
+    print(f"{'filter':16s} {'us/report':>10s} {'step 90%':>10s} {'ramp lag':>10s} {'noise left':>11s}")
+    for spec in FILTER_BENCHMARK_SPECS:
+        filters = {axis: axis_filter(spec) for axis in STICK_AXES}
+        smoother = AxisSmoother({axis: f for axis, f in filters.items() if f is not None})
+        timestamps = itertools.count(0, interval_ns)
+        elapsed = min(timeit.repeat(
+            lambda: smoother.apply_report(next(timestamps), BENCHMARK_REPORT),
+            number=count, repeat=3))
+        step_ms, ramp_ms, noise = filter_response(spec, rate_hz)
+        print(f"{spec:16s} {elapsed / count * 1e6:10.2f} {step_ms:8.1f}ms "
+              f"{ramp_ms:8.1f}ms {noise:10.1%}")
+    print(f"(4 axes per report at {rate_hz} Hz; 'none' is the cost of copying the report)")
+
+BENCHMARKS = {
+    "decode": lambda args: benchmark_decode(),
+    "batch": lambda args: benchmark_batch(),
+    "latency": lambda args: benchmark_latency(args.bench_duration, args.bench_output),
+    "filter": lambda args: benchmark_filter(),
+}
+
+def per_stick(convert):
+    """argparse type for VALUE or LEFT,RIGHT; returns a (left, right) pair"""
+    def parse(text):
+        values = [convert(part) for part in text.split(",")]
+        if len(values) > 2:
+            raise argparse.ArgumentTypeError("expected one value or LEFT,RIGHT")
+        return values[0], values[-1]
+    return parse
+
+def smoother_from_args(args):
+    """AxisSmoother for the --smooth options, or None if no axis is filtered"""
+    filters = {}
+    for item in args.smooth or ():
+        target, sep, spec = item.rpartition("=")
+        if not sep:
+            axes = STICK_AXES
+        elif target in ("left", "right"):
+            axes = (f"{target}_x", f"{target}_y")
+        elif target in STICK_AXES:
+            axes = (target,)
+        else:
+            raise ValueError(f"unknown axis {target!r}")
+        for axis in axes:
+            filters[axis] = axis_filter(spec)  # One filter (and state) per axis
+    filters = {axis: f for axis, f in filters.items() if f is not None}
+    return AxisSmoother(filters) if filters else None
+
+def stick_responses_from_args(args):
+    """(left, right) StickResponse for --deadzone/--response-curve, or None if neither is set"""
+    if args.deadzone is None and args.response_curve is None:
+        return None
+    deadzones = args.deadzone or (0.0, 0.0)
+    curves = args.response_curve or ("linear", "linear")
+    return tuple(StickResponse(deadzone / 100, curve, args.deadzone_mode)
+                 for deadzone, curve in zip(deadzones, curves))
+
+def run_calibration(reader):
+    """Calibrate the reader's device interactively and store its profile"""
+    key = reader.calibration_key()
+    if key is None:
+        print("Calibration needs a USB device (not --replay or --linux-input)")
+        return False
+    try:
+        calibration = reader.calibrate()
+    except usb.core.USBError as e:
+        print(f"USB Error: {str(e)}")
+        return False
+    except KeyboardInterrupt:
+        print("\nCalibration cancelled")
+        return False
+    if calibration is None:
+        print("No reports received; is the controller connected?")
+        return False
+
+    print(f"\nCalibration for {key}:")
+    print("\n".join(calibration.format()))
+    unswept = calibration.unswept()
+    if unswept:
+        print(f"Warning: {', '.join(unswept)} barely moved and keep the default range; "
+              f"run --calibrate again to cover their full range")
+    save_calibration(key, calibration)
+    print(f"Saved to {CALIBRATION_FILE}")
+    return True
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Read and display USB gamepad input")
+    parser.add_argument("--poll-interval", type=float, default=100.0,
+                        help="Max time in ms a single endpoint read may block (default: 100)")
+    parser.add_argument("--transfers", type=int, default=0,
+                        help="Keep N async libusb1 transfers in flight instead of "
+                             "synchronous reads (requires python-libusb1)")
+    parser.add_argument("--threaded", action="store_true",
+                        help="Capture reports on a dedicated thread into a ring buffer")
+    parser.add_argument("--changes-only", action="store_true",
+                        help="Only redraw when the report differs from the previous one")
+    parser.add_argument("--events", action="store_true",
+                        help="Print button press/release events instead of the full state")
+    parser.add_argument("--fps", type=float, default=0,
+                        help="Redraw at most FPS times per second from a render thread, "
+                             "updating only changed lines (default: redraw every report)")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Write every raw report to a new binary capture file")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Let --record replace an existing capture file")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Replay a capture file instead of reading a device")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed factor; 0 replays as fast as possible (default: 1)")
+    parser.add_argument("--linux-input", metavar="PATH", nargs="?", const="auto",
+                        help="Read through a hidraw/evdev node instead of libusb; finds "
+                             "the node automatically when PATH is omitted (Linux only)")
+    parser.add_argument("--simulate", metavar="SOURCE",
+                        help="Use a simulated gamepad instead of USB hardware; SOURCE is "
+                             "'synthetic', a capture file or a report script")
+    parser.add_argument("--sim-rate", type=float, default=1000.0,
+                        help="Simulated report rate in Hz (default: 1000)")
+    parser.add_argument("--sim-jitter", type=float, default=0.0,
+                        help="Simulated inter-report jitter, std dev in ms (default: 0)")
+    parser.add_argument("--sim-count", type=int, default=1,
+                        help="Number of simulated gamepads (default: 1)")
+    parser.add_argument("--all-devices", action="store_true",
+                        help="Read every matching gamepad at once and print their "
+                             "button events as one time-ordered stream")
+    parser.add_argument("--shared-memory", metavar="NAME", nargs="?", const="",
+                        help="Publish the latest decoded state in a shared memory block "
+                             "for other processes (see SharedStateReader); a name is "
+                             "generated when NAME is omitted")
+    parser.add_argument("--send-datagrams", metavar="ADDRESS", type=parse_datagram_address,
+                        help="Send every changed state as a binary datagram to HOST:PORT "
+                             "(UDP) or a Unix datagram socket path (see StateDatagramReceiver)")
+    parser.add_argument("--deadzone", metavar="PCT[,PCT]", type=per_stick(float),
+                        help="Stick deadzone in percent of full travel; a second value "
+                             "sets the right stick separately")
+    parser.add_argument("--deadzone-mode", choices=("radial", "axial"), default="radial",
+                        help="Apply the deadzone to the distance from center or to each "
+                             "axis (default: radial)")
+    parser.add_argument("--response-curve", metavar="CURVE[,CURVE]", type=per_stick(str),
+                        help="Stick response curve: linear, quadratic, cubic or a power "
+                             "exponent; a second value sets the right stick separately")
+    parser.add_argument("--smooth", metavar="[AXIS=]FILTER", action="append",
+                        help="Smooth stick axes with ema[:ALPHA] or one-euro[:MIN_CUTOFF"
+                             "[,BETA[,D_CUTOFF]]] (or none); AXIS is left, right, left_x, "
+                             "left_y, right_x or right_y, all axes if omitted. Repeatable")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Measure stick centers/ranges and trigger ranges from live "
+                             "input and save them as this device's calibration profile")
+    parser.add_argument("--no-calibration", action="store_true",
+                        help="Ignore any saved calibration profile")
+    parser.add_argument("--reconnect", action="store_true",
+                        help="When the device disconnects, wait for it to come back "
+                             "and resume instead of exiting")
+    parser.add_argument("--stats", action="store_true",
+                        help="Print report rate, jitter, timeout, error and drop counters on exit")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--benchmark", choices=sorted(BENCHMARKS),
+                        help="Run a micro-benchmark instead of reading a device")
+    parser.add_argument("--bench-duration", type=float, default=5.0,
+                        help="Seconds per report rate for --benchmark latency (default: 5)")
+    parser.add_argument("--bench-output", default="latency-benchmark.json",
+                        help="JSON results file for --benchmark latency "
+                             "(default: latency-benchmark.json)")
+    return parser.parse_args(argv)
+
 def main():
-    reader = GamePadReader()
-    
-    if not reader.find_device():
-        print("Device not found!")
+    args = parse_args()
+    if args.benchmark:
+        BENCHMARKS[args.benchmark](args)
+        return
+
+    backend = None
+    if args.simulate:
+        gamepads = []
+        for index in range(args.sim_count):
+            seed = index if args.sim_count > 1 else None  # Distinct but repeatable pads
+            try:
+                reports = simulated_reports(args.simulate, seed=seed)
+            except (OSError, ValueError) as e:
+                print(f"Could not load simulation source: {e}")
+                sys.exit(1)
+            gamepads.append(SimulatedGamepad(reports, args.sim_rate, args.sim_jitter / 1000,
+                                             address=index + 1, serial=f"SIM{index + 1:04d}",
+                                             seed=seed))
+        backend = SimulatedBackend(gamepads)
+
+    if args.all_devices:
+        multi = MultiGamepadReader(poll_interval=args.poll_interval / 1000, backend=backend)
+        if not multi.find_devices():
+            print("Device not found!")
+            sys.exit(1)
+        if not multi.setup_devices():
+            print("Failed to setup devices!")
+            sys.exit(1)
+        multi.read_input(print_stats=args.stats)
+        return
+
+    try:
+        stick_responses = stick_responses_from_args(args)
+    except ValueError as e:
+        print(f"Invalid stick response: {e}")
         sys.exit(1)
-        
-    if not reader.setup_device():
-        print("Failed to setup device!")
+    try:
+        smoother = smoother_from_args(args)
+    except ValueError as e:
+        print(f"Invalid smoothing filter: {e}")
         sys.exit(1)
-        
-    reader.read_input()
+
+    reader = GamePadReader(poll_interval=args.poll_interval / 1000, backend=backend)
+    
+    if args.replay:
+        if not reader.open_capture(args.replay, args.speed):
+            sys.exit(1)
+    elif args.linux_input or (reader.backend is None and sys.platform.startswith("linux")):
+        path = None if args.linux_input in (None, "auto") else args.linux_input
+        if not reader.open_linux_input(path):
+            sys.exit(1)
+    else:
+        if not reader.find_device():
+            print("Device not found!")
+            sys.exit(1)
+            
+        if not reader.setup_device():
+            print("Failed to setup device!")
+            sys.exit(1)
+
+    if args.calibrate:
+        sys.exit(0 if run_calibration(reader) else 1)
+
+    calibration = None
+    key = reader.calibration_key()
+    if key is not None and not args.no_calibration:
+        calibration = load_calibration(key)
+        if calibration is not None:
+            print(f"Using calibration profile for {key}")
+
+    stick_shaper = None
+    if stick_responses is not None or calibration is not None:
+        stick_shaper = StickShaper(*(stick_responses or (None, None)), calibration=calibration)
+
+    reader.read_input(transfers=args.transfers, threaded=args.threaded,
+                      changes_only=args.changes_only, events=args.events,
+                      fps=args.fps, record_path=args.record, print_stats=args.stats,
+                      metrics_port=args.metrics_port, reconnect=args.reconnect,
+                      shared_memory_name=args.shared_memory,
+                      datagram_address=args.send_datagrams, stick_shaper=stick_shaper,
+                      smoother=smoother, overwrite_record=args.overwrite)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,376 @@
+"""
+Decoded gamepad state and the formats gamepad-reader.py shares it in.
+
+Needs only the standard library, so other processes can receive the
+state without pyusb, either from shared memory (Python 3.8+):
+
+    from gamepad_state import SharedStateReader
+
+    with SharedStateReader("gamepad") as reader:
+        sequence, state = reader.read()
+        print(state.left_stick, state.button_names)
+
+or as datagrams:
+
+    from gamepad_state import StateDatagramReceiver, parse_datagram_address
+
+    with StateDatagramReceiver(parse_datagram_address("127.0.0.1:9000")) as receiver:
+        for sequence, state in receiver:
+            print(state.button_names)
+"""
+import os
+import socket
+import struct
+import sys
+import time
+
+# D-pad bit masks (byte 2, lower 4 bits)
+DPAD_UP = 0x01
+DPAD_DOWN = 0x02
+DPAD_LEFT = 0x04
+DPAD_RIGHT = 0x08
+
+# Button bitmask: byte 3 in bits 0-7, byte 2 upper nibble in bits 12-15,
+# byte 14 in bits 16-23
+BUTTON_L1 = 0x000001
+BUTTON_R1 = 0x000002
+BUTTON_MODE = 0x000004
+BUTTON_A = 0x000010
+BUTTON_B = 0x000020
+BUTTON_X = 0x000040
+BUTTON_Y = 0x000080
+BUTTON_START = 0x001000
+BUTTON_SELECT = 0x002000
+BUTTON_TURBO = 0x200000
+BUTTON_CLEAR = 0x400000
+
+DPAD_NAMES = ((DPAD_UP, "Up"), (DPAD_DOWN, "Down"),
+              (DPAD_LEFT, "Left"), (DPAD_RIGHT, "Right"))
+BUTTON_NAMES = ((BUTTON_START, "Start"), (BUTTON_SELECT, "Select"),
+                (BUTTON_L1, "L1"), (BUTTON_R1, "R1"), (BUTTON_MODE, "Mode"),
+                (BUTTON_A, "A"), (BUTTON_B, "B"), (BUTTON_X, "X"), (BUTTON_Y, "Y"))
+SPECIAL_NAMES = ((BUTTON_TURBO, "Turbo"), (BUTTON_CLEAR, "Clear"))
+
+def axis_percent(value):
+    """Signed 16-bit axis value to percent (0x7FFF is just under 100%)"""
+    if value >= 0:
+        return (value / 32768) * 100
+    return (value / 32767) * 100
+
+def bit_names(bits, names):
+    """Names of the bits set in bits, from a ((mask, name), ...) table"""
+    return [name for mask, name in names if bits & mask]
+
+class GamepadState:
+    """
+    Decoded controller state holding only integers.
+
+    Names and percentages are computed on access, so decoding and
+    comparing states never allocates strings or lists.
+    """
+
+    __slots__ = ("buttons", "dpad", "l2", "r2",
+                 "left_x", "left_y", "right_x", "right_y", "timestamp_ns")
+
+    def __init__(self, buttons=0, dpad=0, l2=0, r2=0,
+                 left_x=0, left_y=0, right_x=0, right_y=0, timestamp_ns=None):
+        self.buttons = buttons  # BUTTON_* bitmask
+        self.dpad = dpad  # DPAD_* nibble
+        self.l2 = l2  # Raw trigger bytes, 0-255
+        self.r2 = r2
+        self.left_x = left_x  # Raw signed 16-bit axes
+        self.left_y = left_y
+        self.right_x = right_x
+        self.right_y = right_y
+        self.timestamp_ns = timestamp_ns
+
+    def __eq__(self, other):
+        if not isinstance(other, GamepadState):
+            return NotImplemented
+        return (self.buttons == other.buttons and self.dpad == other.dpad and
+                self.l2 == other.l2 and self.r2 == other.r2 and
+                self.left_x == other.left_x and self.left_y == other.left_y and
+                self.right_x == other.right_x and self.right_y == other.right_y)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"GamepadState(buttons=0x{self.buttons:06x}, dpad=0x{self.dpad:x}, "
+                f"l2={self.l2}, r2={self.r2}, left=({self.left_x}, {self.left_y}), "
+                f"right=({self.right_x}, {self.right_y}))")
+
+    def is_pressed(self, button):
+        """True if any bit of the BUTTON_* mask is held"""
+        return bool(self.buttons & button)
+
+    @property
+    def button_names(self):
+        return bit_names(self.buttons, BUTTON_NAMES)
+
+    @property
+    def special_names(self):
+        return bit_names(self.buttons, SPECIAL_NAMES)
+
+    @property
+    def dpad_names(self):
+        return bit_names(self.dpad, DPAD_NAMES)
+
+    @property
+    def left_stick(self):
+        """(x, y) in percent"""
+        return axis_percent(self.left_x), axis_percent(self.left_y)
+
+    @property
+    def right_stick(self):
+        """(x, y) in percent"""
+        return axis_percent(self.right_x), axis_percent(self.right_y)
+
+    @property
+    def l2_level(self):
+        """Left trigger pressure, 0.0-1.0"""
+        return self.l2 / 255
+
+    @property
+    def r2_level(self):
+        """Right trigger pressure, 0.0-1.0"""
+        return self.r2 / 255
+
+# Decoded state as stored in shared memory: timestamp_ns, buttons, dpad,
+# l2, r2 and the four raw axes, behind an 8-byte sequence counter
+STATE_STRUCT = struct.Struct("<QIBBBxhhhh")
+SEQ_STRUCT = struct.Struct("<Q")
+SHARED_STATE_SIZE = SEQ_STRUCT.size + STATE_STRUCT.size
+
+class SharedStatePublisher:
+    """
+    Publish the latest decoded state in a multiprocessing.shared_memory block.
+
+    Writes follow the seqlock pattern: the counter is made odd, the state
+    is packed in place, then the counter is made even again. The writer
+    never waits for readers; a SharedStateReader retries when it sees an
+    odd counter or the counter changed under it. This relies on the two
+    counter stores becoming visible around the state store in program
+    order, which x86 guarantees.
+    """
+
+    def __init__(self, name=None):
+        from multiprocessing import shared_memory  # Python 3.8+, only needed here
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=SHARED_STATE_SIZE)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.seq = 0
+        SEQ_STRUCT.pack_into(self.buf, 0, 0)
+
+    def publish(self, state):
+        """Make state the current one"""
+        buf = self.buf
+        SEQ_STRUCT.pack_into(buf, 0, self.seq + 1)  # Odd: write in progress
+        STATE_STRUCT.pack_into(buf, SEQ_STRUCT.size, state.timestamp_ns or 0,
+                               state.buttons, state.dpad, state.l2, state.r2,
+                               state.left_x, state.left_y, state.right_x, state.right_y)
+        self.seq += 2
+        SEQ_STRUCT.pack_into(buf, 0, self.seq)
+
+    def close(self):
+        """Unmap and remove the block; attached readers keep their mapping"""
+        if self.shm is None:
+            return
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SharedStateReader:
+    """
+    Read the state published by a SharedStatePublisher in another process.
+
+    read() unpacks straight from the mapped block, so getting the newest
+    state costs no system call and no intermediate copy.
+    """
+
+    def __init__(self, name):
+        from multiprocessing import shared_memory, resource_tracker  # Python 3.8+
+        if sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Otherwise the resource tracker unlinks the publisher's block when we exit
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.buf = self.shm.buf
+
+    def read(self, timeout=0.1):
+        """
+        Return (sequence, GamepadState) for the newest state, or None before
+        the first. Raises TimeoutError if no consistent state could be read
+        for timeout seconds, e.g. because the publisher died mid-write.
+        """
+        buf = self.buf
+        deadline = None
+        while True:
+            seq = SEQ_STRUCT.unpack_from(buf, 0)[0]
+            if not seq & 1:  # Odd: writer is mid-update
+                fields = STATE_STRUCT.unpack_from(buf, SEQ_STRUCT.size)
+                if SEQ_STRUCT.unpack_from(buf, 0)[0] == seq:
+                    break
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise TimeoutError("shared state stayed mid-update; is the publisher alive?")
+            time.sleep(0)  # Let the writer finish
+        if not seq:
+            return None
+        timestamp_ns, buttons, dpad, l2, r2, left_x, left_y, right_x, right_y = fields
+        return seq >> 1, GamepadState(buttons, dpad, l2, r2, left_x, left_y,
+                                      right_x, right_y, timestamp_ns)
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.buf = None
+        self.shm.close()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# One record of a state datagram: sequence number followed by STATE_STRUCT
+DATAGRAM_STRUCT = struct.Struct("<Q" + STATE_STRUCT.format.lstrip("<"))
+
+def parse_datagram_address(text):
+    """HOST:PORT for UDP, anything else is a Unix datagram socket path"""
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return text
+
+def _datagram_family(address):
+    return socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+
+class StateDatagramSender:
+    """
+    Send decoded states as fixed-size DATAGRAM_STRUCT records.
+
+    send() packs into a preallocated buffer and flush() sends everything
+    queued as one datagram, so states that became ready together cost a
+    single system call. The socket is non-blocking: when no receiver is
+    listening or its buffer is full, the batch is dropped and counted
+    rather than stalling the read loop. Receivers detect the loss from
+    gaps in the sequence numbers.
+    """
+
+    def __init__(self, address, batch_size=32):
+        self.address = address
+        self.batch_size = batch_size
+        self.sock = socket.socket(_datagram_family(address), socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.buffer = bytearray(DATAGRAM_STRUCT.size * batch_size)
+        self.view = memoryview(self.buffer)
+        self.pending = 0
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, state):
+        """Queue state, sending the batch once it is full"""
+        self.seq += 1
+        DATAGRAM_STRUCT.pack_into(self.buffer, self.pending * DATAGRAM_STRUCT.size, self.seq,
+                                  state.timestamp_ns or 0, state.buttons, state.dpad,
+                                  state.l2, state.r2, state.left_x, state.left_y,
+                                  state.right_x, state.right_y)
+        self.pending += 1
+        if self.pending == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Send every queued state as one datagram"""
+        count = self.pending
+        if not count:
+            return
+        self.pending = 0
+        try:
+            self.sock.sendto(self.view[:count * DATAGRAM_STRUCT.size], self.address)
+            self.sent += count
+        except OSError:
+            self.dropped += count  # No receiver yet, or its queue is full
+
+    def close(self):
+        if self.sock is None:
+            return
+        self.flush()
+        self.view.release()
+        self.sock.close()
+        self.sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class StateDatagramReceiver:
+    """
+    Receive states sent by a StateDatagramSender.
+
+    Binds address (a Unix socket path is replaced if it exists and removed
+    on close). receive() returns the (sequence, GamepadState) records of
+    one datagram; lost counts states missing from sequence gaps.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.sock = socket.socket(_datagram_family(address), socket.SOCK_DGRAM)
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        self.sock.bind(address)
+        self.buffer = bytearray(65536)
+        self.last_seq = None
+        self.lost = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def receive(self, timeout=None):
+        """Return the records of the next datagram, or [] on timeout"""
+        self.sock.settimeout(timeout)
+        try:
+            length = self.sock.recv_into(self.buffer)
+        except socket.timeout:
+            return []
+        records = []
+        for offset in range(0, length - DATAGRAM_STRUCT.size + 1, DATAGRAM_STRUCT.size):
+            seq, timestamp_ns, buttons, dpad, l2, r2, left_x, left_y, right_x, right_y = \
+                DATAGRAM_STRUCT.unpack_from(self.buffer, offset)
+            if self.last_seq is not None and seq > self.last_seq + 1:
+                self.lost += seq - self.last_seq - 1
+            self.last_seq = seq
+            records.append((seq, GamepadState(buttons, dpad, l2, r2, left_x, left_y,
+                                              right_x, right_y, timestamp_ns)))
+        return records
+
+    def __iter__(self):
+        """Yield (sequence, GamepadState) until closed"""
+        while self.sock is not None:
+            yield from self.receive()
+
+    def close(self):
+        if self.sock is None:
+            return
+        self.sock.close()
+        self.sock = None
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
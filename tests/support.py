@@ -0,0 +1,57 @@
+"""Load gamepad-reader.py, whose hyphenated file name cannot be imported directly, plus simulated-pad helpers"""
+import contextlib
+import errno
+import importlib.util
+import io
+import os
+import sys
+
+import usb.core
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO, "gamepad-reader.py")
+sys.path.insert(0, REPO)  # For gamepad_state, next to the script
+
+_spec = importlib.util.spec_from_file_location("gamepad_reader", SCRIPT)
+gamepad = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(gamepad)
+
+def report(byte3=0, dpad=0, left_x=0, left_y=0, right_x=0, right_y=0, l2=0, r2=0):
+    """20-byte input report with buttons from byte 3, D-pad bits, triggers and sticks"""
+    data = bytearray(gamepad.REPORT_SIZE)
+    data[1] = gamepad.REPORT_SIZE
+    data[2] = dpad
+    data[3] = byte3
+    data[4] = l2
+    data[5] = r2
+    gamepad.AXES_STRUCT.pack_into(data, gamepad.AXES_OFFSET, left_x, left_y, right_x, right_y)
+    return bytes(data)
+
+IDLE = report()
+A_HELD = report(byte3=0x10)
+UP_HELD = report(dpad=gamepad.DPAD_UP)
+
+def quiet(func, *args, **kwargs):
+    """Call func with its progress messages discarded"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+def simulated_reader(reports, rate_hz=5000, **pad_options):
+    """GamePadReader set up on one simulated pad serving reports"""
+    pad = gamepad.SimulatedGamepad(reports, rate_hz, **pad_options)
+    reader = gamepad.GamePadReader(poll_interval=0.05,
+                                   backend=gamepad.SimulatedBackend([pad]))
+    if not quiet(reader.find_device) or not quiet(reader.setup_device):
+        raise AssertionError("simulated pad could not be set up")
+    return reader, pad
+
+def read_until_unplugged(iterator):
+    """Collect items until the exhausted pad reports itself disconnected"""
+    items = []
+    try:
+        for item in iterator:
+            items.append(item)
+    except usb.core.USBError as e:
+        if e.errno != errno.ENODEV:
+            raise
+    return items
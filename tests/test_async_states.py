@@ -0,0 +1,87 @@
+import asyncio
+import errno
+import unittest
+
+import usb.core
+
+from support import gamepad, report, simulated_reader
+
+REPORTS = [report(left_x=i) for i in range(100)]
+
+async def drain(stream):
+    """Consume states until the exhausted pad unplugs"""
+    states = []
+    try:
+        async for state in stream:
+            states.append(state.left_x)
+    except usb.core.USBError as e:
+        if e.errno != errno.ENODEV:
+            raise
+    return states
+
+class BackpressureTest(unittest.TestCase):
+    def read_behind(self, backpressure, maxsize):
+        """Take one state, let the reader thread finish, then drain the rest"""
+        reader, pad = simulated_reader(REPORTS)
+
+        async def slow_consumer():
+            stream = reader.states(backpressure, maxsize)
+            first = (await stream.__anext__()).left_x
+            await asyncio.get_running_loop().run_in_executor(None, stream.thread.join, 5)
+            return first, await drain(stream), stream.dropped
+
+        return asyncio.run(slow_consumer())
+
+    def test_drop_oldest_keeps_the_newest_states(self):
+        first, rest, dropped = self.read_behind("drop-oldest", 8)
+        self.assertEqual(first, 0)
+        self.assertEqual(rest, list(range(92, 100)))
+        self.assertEqual(dropped, 91)
+
+    def test_coalesce_keeps_only_the_latest_state(self):
+        first, rest, dropped = self.read_behind("coalesce", 8)
+        self.assertLess(first, 99)
+        self.assertEqual(rest, [99])
+        self.assertEqual(dropped, 98)  # Everything but the two states consumed
+
+    def test_block_delivers_every_state_in_order(self):
+        reader, pad = simulated_reader(REPORTS)
+
+        async def slow_consumer():
+            stream = reader.states("block", maxsize=4)
+            states = []
+            try:
+                async for state in stream:
+                    states.append(state.left_x)
+                    await asyncio.sleep(0.001)
+            except usb.core.USBError:
+                pass
+            return states, stream.dropped
+
+        states, dropped = asyncio.run(slow_consumer())
+        self.assertEqual(states, list(range(100)))
+        self.assertEqual(dropped, 0)
+
+    def test_unknown_mode_is_rejected(self):
+        reader, pad = simulated_reader(REPORTS)
+        with self.assertRaises(ValueError):
+            reader.states("drop-newest")
+
+class NextStateTest(unittest.TestCase):
+    def test_next_state_reads_from_a_shared_stream(self):
+        reader, pad = simulated_reader(gamepad.synthetic_reports(0), rate_hz=1000)
+
+        async def two_states():
+            first = await reader.next_state()
+            second = await reader.next_state()
+            stream = reader._state_stream
+            await stream.aclose()
+            return first, second, stream
+
+        first, second, stream = asyncio.run(two_states())
+        self.assertIsInstance(first, gamepad.GamepadState)
+        self.assertLessEqual(first.timestamp_ns, second.timestamp_ns)
+        self.assertEqual(stream.backpressure, "coalesce")
+
+if __name__ == "__main__":
+    unittest.main()
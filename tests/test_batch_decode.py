@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from support import gamepad, report
+
+np = gamepad.np
+
+def random_reports(count, seed=7):
+    rng = random.Random(seed)
+    reports = [report(byte3=rng.randrange(256), dpad=rng.randrange(256),
+                      left_x=rng.randrange(-32768, 32768), left_y=rng.randrange(-32768, 32768),
+                      right_x=rng.randrange(-32768, 32768), right_y=rng.randrange(-32768, 32768),
+                      l2=rng.randrange(256), r2=rng.randrange(256))
+               for _ in range(count)]
+    # Extremes and center on every axis
+    for value in (-32768, -1, 0, 1, 32767):
+        reports.append(report(left_x=value, left_y=value, right_x=value, right_y=value))
+    for i, data in enumerate(reports):
+        data = bytearray(data)
+        data[14] = i & 0xFF  # Turbo/Clear byte
+        reports[i] = bytes(data)
+    return reports
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class BatchDecodeTest(unittest.TestCase):
+    def assert_matches_decode_report(self, batch, reports):
+        self.assertEqual(len(batch), len(reports))
+        for row, data in zip(batch, reports):
+            state = gamepad.decode_report(data)
+            self.assertEqual((int(row["buttons"]), int(row["dpad"]), int(row["l2"]), int(row["r2"])),
+                             (state.buttons, state.dpad, state.l2, state.r2))
+            for axis in ("left_x", "left_y", "right_x", "right_y"):
+                self.assertAlmostEqual(float(row[axis]),
+                                       gamepad.axis_percent(getattr(state, axis)), places=9)
+
+    def test_bytes_buffer_matches_decode_report(self):
+        reports = random_reports(500)
+        self.assert_matches_decode_report(gamepad.decode_reports_batch(b"".join(reports)), reports)
+
+    def test_array_matches_decode_report(self):
+        reports = random_reports(50, seed=11)
+        raw = np.frombuffer(b"".join(reports), dtype=np.uint8).reshape(-1, gamepad.REPORT_SIZE)
+        self.assert_matches_decode_report(gamepad.decode_reports_batch(raw), reports)
+
+    def test_reports_too_short_are_rejected(self):
+        with self.assertRaises(ValueError):
+            gamepad.decode_reports_batch(np.zeros((4, 10), dtype=np.uint8))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import errno
+import itertools
+import os
+import tempfile
+import time
+import unittest
+
+import usb.core
+
+from support import IDLE, gamepad, quiet, report, simulated_reader
+
+class SilentAtRestPad(gamepad.SimulatedGamepad):
+    """Pad that, like the real one, sends nothing until the sticks move"""
+
+    def __init__(self, silent_for, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.silent_until = time.monotonic() + silent_for
+
+    def read(self, timeout_ms):
+        remaining = self.silent_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(min(remaining, timeout_ms / 1000))
+            raise usb.core.USBTimeoutError("Operation timed out", errno=errno.ETIMEDOUT)
+        return super().read(timeout_ms)
+
+SWEEP = [report(left_x=x, left_y=-x, right_x=x // 2, right_y=-x // 2, l2=l2, r2=l2)
+         for x, l2 in ((-31000, 0), (30000, 250), (-20000, 120), (32000, 240))]
+
+class CalibrationTest(unittest.TestCase):
+    def test_default_calibration_is_the_identity(self):
+        calibration = gamepad.Calibration()
+        normalize = calibration.axis_normalizer("left_x")
+        self.assertEqual(normalize(0), 0.0)
+        self.assertEqual(normalize(32767), 1.0)
+        self.assertEqual(normalize(-32768), -1.0)
+        self.assertEqual(calibration.trigger_table("l2"), bytes(range(256)))
+        self.assertEqual(calibration.unswept(), [])
+
+    def test_axis_is_scaled_around_measured_center(self):
+        calibration = gamepad.Calibration({"left_x": (-20000, 1000, 25000)})
+        normalize = calibration.axis_normalizer("left_x")
+        self.assertEqual(normalize(1000), 0.0)
+        self.assertEqual(normalize(25000), 1.0)
+        self.assertEqual(normalize(-20000), -1.0)
+        self.assertAlmostEqual(normalize(-9500), -0.5)
+        self.assertEqual(normalize(30000), 1.0)  # Clamped past the measured extreme
+
+    def test_trigger_rest_and_max_stretch_to_full_range(self):
+        table = gamepad.Calibration(triggers={"r2": (10, 200)}).trigger_table("r2")
+        self.assertEqual((table[0], table[10], table[105], table[200], table[255]),
+                         (0, 0, 128, 255, 255))
+
+    def test_unswept_axis_keeps_default_range(self):
+        calibration = gamepad.Calibration({"right_x": (-300, -300, -300)})
+        normalize = calibration.axis_normalizer("right_x")
+        self.assertAlmostEqual(normalize(-290), 10 / (32767 + 300))
+        self.assertEqual(normalize(32767), 1.0)
+        self.assertEqual(normalize(-32768), -1.0)
+        self.assertEqual(calibration.unswept(), ["right_x"])
+
+    def test_one_sided_sweep_keeps_default_range_on_the_other_side(self):
+        normalize = gamepad.Calibration({"left_y": (-16000, 0, 100)}).axis_normalizer("left_y")
+        self.assertEqual(normalize(-16000), -1.0)
+        self.assertAlmostEqual(normalize(100), 100 / 32767)
+
+    def test_unpressed_trigger_keeps_default_range(self):
+        calibration = gamepad.Calibration(triggers={"r2": (3, 3)})
+        table = calibration.trigger_table("r2")
+        self.assertEqual(table[5], 2)
+        self.assertEqual(table[255], 255)
+        self.assertEqual(calibration.unswept(), ["r2"])
+
+    def test_profiles_round_trip_through_the_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "nested", "calibration.json")
+            first = gamepad.Calibration({"left_x": (-30000, 120, 31000)}, {"l2": (4, 250)})
+            gamepad.save_calibration("pad-a", first, path)
+            gamepad.save_calibration("pad-b", gamepad.Calibration(), path)
+
+            loaded = gamepad.load_calibration("pad-a", path)
+            self.assertEqual(loaded.axes, first.axes)
+            self.assertEqual(loaded.triggers, first.triggers)
+            self.assertIsNotNone(gamepad.load_calibration("pad-b", path))
+            self.assertIsNone(gamepad.load_calibration("pad-c", path))
+
+class CalibrateTest(unittest.TestCase):
+    def test_pad_silent_while_centered_is_calibrated_from_the_sweep(self):
+        pad = SilentAtRestPad(0.4, itertools.chain([IDLE], SWEEP, itertools.repeat(IDLE)))
+        reader = gamepad.GamePadReader(poll_interval=0.05,
+                                       backend=gamepad.SimulatedBackend([pad]))
+        self.assertTrue(quiet(reader.find_device) and quiet(reader.setup_device))
+
+        calibration = quiet(reader.calibrate, 0.3, 0.5)
+
+        self.assertIsNotNone(calibration)
+        self.assertEqual(calibration.axes["left_x"], (-31000, 0, 32000))
+        self.assertEqual(calibration.axes["left_y"], (-32000, 0, 31000))
+        self.assertEqual(calibration.axes["right_x"], (-15500, 0, 16000))
+        self.assertEqual(calibration.triggers, {"l2": (0, 250), "r2": (0, 250)})
+
+    def test_no_reports_at_all_gives_none(self):
+        pad = SilentAtRestPad(60, [IDLE])
+        reader = gamepad.GamePadReader(poll_interval=0.05,
+                                       backend=gamepad.SimulatedBackend([pad]))
+        self.assertTrue(quiet(reader.find_device) and quiet(reader.setup_device))
+        self.assertIsNone(quiet(reader.calibrate, 0.1, 0.1))
+
+class CalibrationKeyTest(unittest.TestCase):
+    def test_key_uses_serial_number(self):
+        reader, pad = simulated_reader([IDLE], serial="SIM0042")
+        self.assertEqual(reader.calibration_key(), "045e:028e/serial-SIM0042")
+
+    def test_key_falls_back_to_bus_and_port(self):
+        reader, pad = simulated_reader([IDLE], address=3, serial=None)
+        self.assertEqual(reader.calibration_key(), "045e:028e/bus1-3")
+
+if __name__ == "__main__":
+    unittest.main()
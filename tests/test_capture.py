@@ -0,0 +1,114 @@
+import contextlib
+import io
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+from support import A_HELD, IDLE, gamepad, quiet, report, simulated_reader
+
+class CaptureTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "session.gprc")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+class CaptureWriterTest(CaptureTestCase):
+    def test_recording_keeps_every_report(self):
+        reports = [report(byte3=i & 0xF0, left_x=i * 100) for i in range(300)]
+        reader, pad = simulated_reader(reports)
+        quiet(reader.read_input, events=True, record_path=self.path)
+
+        with gamepad.CaptureReplay(self.path) as replay:
+            self.assertEqual((replay.vendor_id, replay.product_id), (0x045e, 0x028e))
+            self.assertEqual([bytes(data) for _, data in replay.records()], reports)
+
+    def test_existing_capture_is_not_overwritten(self):
+        reader, pad = simulated_reader([IDLE] * 10)
+        quiet(reader.read_input, events=True, record_path=self.path)
+        size = os.path.getsize(self.path)
+
+        reader, pad = simulated_reader([A_HELD] * 20)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            reader.read_input(events=True, record_path=self.path)
+        self.assertIn("already exists", output.getvalue())
+        self.assertEqual(os.path.getsize(self.path), size)
+
+    def test_unwritable_path_is_reported_before_other_sinks_start(self):
+        reader, pad = simulated_reader([IDLE] * 10)
+        path = os.path.join(self.directory.name, "missing", "session.gprc")
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            reader.read_input(record_path=path, metrics_port=0, datagram_address=os.path.join(
+                self.directory.name, "sink.sock"))
+        self.assertIn("Could not open capture file", output.getvalue())
+        self.assertNotIn("Serving metrics", output.getvalue())
+        self.assertEqual(pad.reports, 0)
+
+    def test_capture_is_removed_when_a_later_sink_fails(self):
+        reader, pad = simulated_reader([IDLE] * 10)
+        with socket.socket() as busy:
+            busy.bind(("127.0.0.1", 0))
+            busy.listen()
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                reader.read_input(record_path=self.path, metrics_port=busy.getsockname()[1])
+        self.assertIn("Could not start metrics server", output.getvalue())
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_records_are_flushed_while_no_reports_arrive(self):
+        writer = gamepad.CaptureWriter(self.path, flush_interval=0.05)
+        try:
+            writer.write(1, IDLE)
+            record_size = gamepad.capture_record_struct(gamepad.REPORT_SIZE).size
+            deadline = time.monotonic() + 2
+            while (os.path.getsize(self.path) < gamepad.CAPTURE_HEADER.size + record_size
+                   and time.monotonic() < deadline):
+                time.sleep(0.01)
+            self.assertEqual(os.path.getsize(self.path), gamepad.CAPTURE_HEADER.size + record_size)
+        finally:
+            writer.close()
+
+    def test_overwrite_replaces_existing_file(self):
+        with open(self.path, "wb") as f:
+            f.write(b"old")
+        with self.assertRaises(FileExistsError):
+            gamepad.CaptureWriter(self.path)
+        gamepad.CaptureWriter(self.path, overwrite=True).close()
+        with gamepad.CaptureReplay(self.path) as replay:
+            self.assertEqual(len(replay), 0)
+
+class CaptureReplayTest(CaptureTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reports = [report(left_x=i) for i in range(3000)]
+        with gamepad.CaptureWriter(self.path, vendor_id=0x045e, product_id=0x028e) as writer:
+            for i, data in enumerate(self.reports):
+                writer.write(1_000_000 + i * 1000, data)
+
+    def test_seek_finds_records_across_index_blocks(self):
+        with gamepad.CaptureReplay(self.path, index_stride=1024) as replay:
+            self.assertEqual(len(replay), 3000)
+            for i in (0, 1, 1023, 1024, 2500, 2999):
+                self.assertEqual(replay.seek(replay.timestamp(i)), i)
+            self.assertEqual(replay.seek(replay.timestamp(1500) - 1), 1500)
+            self.assertEqual(replay.seek(0), 0)
+            self.assertEqual(replay.seek(10 ** 12), 3000)
+            self.assertEqual(bytes(replay[-1][1]), self.reports[-1])
+
+    def test_replayed_session_matches_recording(self):
+        replayer = gamepad.GamePadReader(backend=object())
+        self.assertTrue(quiet(replayer.open_capture, self.path, speed=0))
+        replayed = [bytes(data) for _, data in replayer.iter_reports()]
+        replayer.replay.close()
+        self.assertEqual(replayed, self.reports)
+
+    def test_rejects_files_that_are_not_captures(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a capture file")
+        with self.assertRaises(ValueError):
+            gamepad.CaptureReplay(self.path)
+
+if __name__ == "__main__":
+    unittest.main()
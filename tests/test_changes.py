@@ -0,0 +1,35 @@
+import unittest
+
+from support import A_HELD, IDLE, UP_HELD, gamepad, read_until_unplugged, report, simulated_reader
+
+class ChangeFilterTest(unittest.TestCase):
+    def test_forwards_only_changes(self):
+        reader, pad = simulated_reader([IDLE] * 5 + [A_HELD] * 3 + [IDLE] * 2)
+        changes = read_until_unplugged(reader.iter_changes())
+
+        self.assertEqual(len(changes), 3)
+        flags = [changed for _, changed in changes]
+        self.assertEqual(flags[0], gamepad.changed_fields(None, changes[0][0]))  # Everything
+        self.assertEqual(flags[1:], [gamepad.CHANGED_BUTTONS, gamepad.CHANGED_BUTTONS])
+        self.assertTrue(changes[1][0].is_pressed(gamepad.BUTTON_A))
+
+class ButtonEdgeDetectorTest(unittest.TestCase):
+    def test_reports_presses_and_releases(self):
+        reader, pad = simulated_reader([IDLE, A_HELD, A_HELD, IDLE, UP_HELD, IDLE])
+        events = read_until_unplugged(reader.iter_button_events())
+
+        self.assertEqual([(event.name, event.pressed) for event in events],
+                         [("A", True), ("A", False), ("Up", True), ("Up", False)])
+        timestamps = [event.timestamp_ns for event in events]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_simultaneous_changes_give_one_event_per_bit(self):
+        detector = gamepad.ButtonEdgeDetector()
+        both = gamepad.decode_report(report(byte3=0x30), 5)  # A and B together
+        self.assertEqual([(event.button, event.pressed, event.timestamp_ns)
+                          for event in detector.feed(both)],
+                         [(gamepad.BUTTON_A, True, 5), (gamepad.BUTTON_B, True, 5)])
+        self.assertEqual(detector.feed(both), [])
+
+if __name__ == "__main__":
+    unittest.main()
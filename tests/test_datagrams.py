@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+import support  # noqa: F401  (puts gamepad_state on the path)
+from gamepad_state import (DATAGRAM_STRUCT, GamepadState, StateDatagramReceiver,
+                           StateDatagramSender, parse_datagram_address)
+
+def state(n):
+    return GamepadState(buttons=n, dpad=n % 16, l2=n % 256, r2=255 - n % 256,
+                        left_x=-n, left_y=n, right_x=32767, right_y=-32768,
+                        timestamp_ns=1_000_000 + n)
+
+def fields(s):
+    return (s.buttons, s.dpad, s.l2, s.r2, s.left_x, s.left_y, s.right_x, s.right_y,
+            s.timestamp_ns)
+
+class DatagramTestMixin:
+    def make_pair(self, batch_size=32):
+        receiver = StateDatagramReceiver(self.address())
+        self.addCleanup(receiver.close)
+        sender = StateDatagramSender(receiver.sock.getsockname(), batch_size)
+        self.addCleanup(sender.close)
+        return sender, receiver
+
+    def test_round_trip(self):
+        sender, receiver = self.make_pair()
+        sender.send(state(7))
+        sender.flush()
+        [(seq, received)] = receiver.receive(timeout=5)
+        self.assertEqual(seq, 1)
+        self.assertEqual(fields(received), fields(state(7)))
+        self.assertEqual((sender.sent, sender.dropped, receiver.lost), (1, 0, 0))
+
+    def test_full_batches_are_sent_as_one_datagram(self):
+        sender, receiver = self.make_pair(batch_size=4)
+        for n in range(10):
+            sender.send(state(n))
+        sender.flush()
+        batches = [receiver.receive(timeout=5) for _ in range(3)]
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 2])
+        received = [record for batch in batches for record in batch]
+        self.assertEqual([seq for seq, _ in received], list(range(1, 11)))
+        self.assertEqual([fields(s) for _, s in received], [fields(state(n)) for n in range(10)])
+
+    def test_sequence_gaps_count_as_lost(self):
+        sender, receiver = self.make_pair()
+        sender.send(state(1))
+        sender.flush()
+        sender.seq += 5  # Five states that never arrived
+        sender.send(state(2))
+        sender.send(state(3))
+        sender.flush()
+        records = receiver.receive(timeout=5) + receiver.receive(timeout=5)
+        self.assertEqual([seq for seq, _ in records], [1, 7, 8])
+        self.assertEqual(receiver.lost, 5)
+
+    def test_receive_times_out_empty(self):
+        sender, receiver = self.make_pair()
+        self.assertEqual(receiver.receive(timeout=0.01), [])
+
+class UnixDatagramTest(DatagramTestMixin, unittest.TestCase):
+    def address(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return os.path.join(directory.name, "gamepad.sock")
+
+    def test_sending_without_receiver_drops_instead_of_blocking(self):
+        with StateDatagramSender(self.address()) as sender:
+            sender.send(state(1))
+            sender.flush()
+            self.assertEqual((sender.sent, sender.dropped), (0, 1))
+
+    def test_socket_file_is_removed_on_close(self):
+        path = self.address()
+        with StateDatagramReceiver(path):
+            self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.exists(path))
+
+class UdpDatagramTest(DatagramTestMixin, unittest.TestCase):
+    def address(self):
+        return ("127.0.0.1", 0)
+
+class ParseAddressTest(unittest.TestCase):
+    def test_host_port_is_udp_and_anything_else_a_path(self):
+        self.assertEqual(parse_datagram_address("127.0.0.1:9000"), ("127.0.0.1", 9000))
+        self.assertEqual(parse_datagram_address(":9000"), ("127.0.0.1", 9000))
+        self.assertEqual(parse_datagram_address("/tmp/gamepad.sock"), "/tmp/gamepad.sock")
+        self.assertEqual(parse_datagram_address("/tmp/a:b"), "/tmp/a:b")
+
+    def test_record_is_fixed_size(self):
+        self.assertEqual(DATAGRAM_STRUCT.size, 32)
+
+if __name__ == "__main__":
+    unittest.main()
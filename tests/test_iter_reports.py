@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from support import gamepad, quiet, simulated_reader
+
+REPORT = bytes([0x00, 0x14, 0x01, 0x10, 0x00, 0xff] + [0] * 14)
+
+class FakeEndpoint:
+    bEndpointAddress = 0x81
+    wMaxPacketSize = 32
+
+class FakeDevice:
+    """Interrupt endpoint that completes one read per millisecond, like a 1 kHz pad"""
+
+    def __init__(self, rate_hz=1000):
+        self.interval = 1 / rate_hz
+        self.next_due = None
+
+    def read(self, address, size, timeout=None):
+        now = time.monotonic()
+        if self.next_due is None or now - self.next_due > self.interval:
+            self.next_due = now
+        wait = self.next_due - now
+        if wait > 0:
+            time.sleep(wait)
+        self.next_due += self.interval
+        return REPORT
+
+class IterReportsTest(unittest.TestCase):
+    def test_drains_1khz_endpoint_at_full_rate(self):
+        reader = gamepad.GamePadReader(poll_interval=0.1, backend=object())
+        reader.device = FakeDevice(1000)
+        reader.endpoint = FakeEndpoint()
+
+        timer = threading.Timer(1.0, reader.stop)
+        timer.start()
+        decoded = 0
+        for timestamp_ns, data in reader.iter_reports():
+            if gamepad.decode_report(data, timestamp_ns) is not None:
+                decoded += 1
+        timer.join()
+
+        # No fixed sleep between reads, so nearly every 1 ms report is taken
+        self.assertGreaterEqual(decoded, 950)
+        self.assertLessEqual(decoded, 1050)
+
+class StopTest(unittest.TestCase):
+    def test_stop_before_reader_thread_starts_is_kept(self):
+        reader, pad = simulated_reader(gamepad.synthetic_reports(0), rate_hz=1000)
+        reader.stop()
+        ring = gamepad.RawReportRing(report_size=reader.report_size())
+        thread = gamepad.ReportReaderThread(reader, ring)
+        thread.start()
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(pad.reports, 0)
+
+    def test_stopped_reader_does_not_wait_for_reconnect(self):
+        reader, pad = simulated_reader(gamepad.synthetic_reports(0), rate_hz=1000)
+        reader.stop()
+        pad.connected = False
+        worker = threading.Thread(target=quiet, args=(reader.acquire, lambda *report: None),
+                                  kwargs={"reconnect": True})
+        worker.start()
+        worker.join(1)
+        self.assertFalse(worker.is_alive())
+
+    def test_multi_reader_stop_before_iteration_is_kept(self):
+        pads = [gamepad.SimulatedGamepad(gamepad.synthetic_reports(i), 1000, address=i + 1)
+                for i in range(2)]
+        multi = quiet(gamepad.MultiGamepadReader, 0.05, gamepad.SimulatedBackend(pads))
+        self.assertTrue(quiet(multi.find_devices) and quiet(multi.setup_devices))
+        multi.stop()
+        started = time.monotonic()
+        self.assertEqual(quiet(list, multi.iter_reports()), [])
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_async_stream_closed_right_after_start(self):
+        reader, pad = simulated_reader(gamepad.synthetic_reports(0), rate_hz=1000)
+
+        async def first_state_then_close():
+            stream = reader.states()
+            state = await stream.__anext__()
+            await asyncio.wait_for(stream.aclose(), 1)
+            return state, stream.thread.is_alive()
+
+        state, alive = asyncio.run(first_state_then_close())
+        self.assertIsInstance(state, gamepad.GamepadState)
+        self.assertFalse(alive)
+
+if __name__ == "__main__":
+    unittest.main()
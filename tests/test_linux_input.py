@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+from support import IDLE, gamepad, report
+
+def event(event_type, code, value, seconds=12, microseconds=345):
+    return gamepad.INPUT_EVENT_STRUCT.pack(seconds, microseconds, event_type, code, value)
+
+def sync(seconds=12, microseconds=345):
+    return event(gamepad.EV_SYN, gamepad.SYN_REPORT, 0, seconds, microseconds)
+
+class LinuxInputTestCase(unittest.TestCase):
+    def open_fifo(self, name):
+        """LinuxInputDevice reading a FIFO named like a device node, plus its write end"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        os.mkfifo(path)
+        device = gamepad.LinuxInputDevice(path)
+        self.addCleanup(device.close)
+        writer = os.open(path, os.O_WRONLY)
+        self.addCleanup(os.close, writer)
+        return device, writer
+
+@unittest.skipUnless(hasattr(gamepad.select, "epoll"), "Linux only")
+class EvdevFoldingTest(LinuxInputTestCase):
+    def test_events_are_folded_into_a_report_per_sync(self):
+        device, writer = self.open_fifo("event7")
+        self.assertEqual(device.kind, "evdev")
+        os.write(writer, b"".join((
+            event(gamepad.EV_KEY, 0x130, 1),          # BTN_A
+            event(gamepad.EV_KEY, 0x13b, 1),          # BTN_START
+            event(gamepad.EV_ABS, gamepad.ABS_X, 1000),
+            event(gamepad.EV_ABS, gamepad.ABS_Y, 2000),  # Y axes are inverted
+            event(gamepad.EV_ABS, gamepad.ABS_RX, -32768),
+            event(gamepad.EV_ABS, gamepad.ABS_RY, -32768),
+            event(gamepad.EV_ABS, gamepad.ABS_Z, 300),  # Clamped to a byte
+            event(gamepad.EV_ABS, gamepad.ABS_RZ, 40),
+            event(gamepad.EV_ABS, gamepad.ABS_HAT0X, -1),
+            event(gamepad.EV_ABS, gamepad.ABS_HAT0Y, 1),
+            sync(12, 345),
+            event(gamepad.EV_KEY, 0x130, 0),
+            event(gamepad.EV_ABS, gamepad.ABS_HAT0X, 1),
+            event(gamepad.EV_ABS, gamepad.ABS_HAT0Y, 0),
+            sync(12, 346),
+        )))
+
+        (first_ns, first), (second_ns, second) = device.read(1)
+        expected = bytearray(report(byte3=0x10, dpad=gamepad.DPAD_LEFT | gamepad.DPAD_DOWN,
+                                    left_x=1000, left_y=-2001, right_x=-32768, right_y=32767,
+                                    l2=255, r2=40))
+        expected[2] |= 0x10  # Start
+        self.assertEqual(first, bytes(expected))
+        self.assertEqual(first_ns, 12_000_345_000)
+
+        expected[3] = 0
+        expected[2] = 0x10 | gamepad.DPAD_RIGHT
+        self.assertEqual(second, bytes(expected))
+        self.assertEqual(second_ns, 12_000_346_000)
+
+        state = gamepad.decode_report(second)
+        self.assertTrue(state.is_pressed(gamepad.BUTTON_START))
+        self.assertFalse(state.is_pressed(gamepad.BUTTON_A))
+
+    def test_dpad_buttons_and_unknown_events(self):
+        device, writer = self.open_fifo("event3")
+        os.write(writer, b"".join((
+            event(gamepad.EV_KEY, 0x2c2, 1),  # BTN_TRIGGER_HAPPY3 -> up
+            event(gamepad.EV_KEY, 0x2ff, 1),  # Not a gamepad button
+            event(gamepad.EV_ABS, 0x28, 5),   # ABS_MISC
+            sync(),
+        )))
+        [(_, data)] = device.read(1)
+        self.assertEqual(data, report(dpad=gamepad.DPAD_UP))
+
+    def test_partial_frame_waits_for_sync(self):
+        device, writer = self.open_fifo("event4")
+        self.assertEqual(device.read(0.01), [])
+        os.write(writer, event(gamepad.EV_KEY, 0x131, 1))
+        self.assertEqual(device.read(1), [])
+        os.write(writer, sync())
+        [(_, data)] = device.read(1)
+        self.assertEqual(data, report(byte3=0x20))
+
+    def test_hidraw_reports_pass_through(self):
+        device, writer = self.open_fifo("hidraw2")
+        self.assertEqual(device.kind, "hidraw")
+        os.write(writer, IDLE)
+        [(_, data)] = device.read(1)
+        self.assertEqual(data, IDLE)
+
+class FindNodeTest(unittest.TestCase):
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_hidraw_node_is_preferred_over_evdev(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.write(os.path.join(root, "input", "event5", "device", "id", "vendor"), "045e\n")
+            self.write(os.path.join(root, "input", "event5", "device", "id", "product"), "028e\n")
+            self.assertEqual(gamepad.LinuxInputDevice.find(0x045e, 0x028e, root),
+                             "/dev/input/event5")
+
+            self.write(os.path.join(root, "hidraw", "hidraw1", "device", "uevent"),
+                       "DRIVER=hid-generic\nHID_ID=0003:0000045E:0000028E\n")
+            self.assertEqual(gamepad.LinuxInputDevice.find(0x045e, 0x028e, root), "/dev/hidraw1")
+            self.assertIsNone(gamepad.LinuxInputDevice.find(0x046d, 0xc21d, root))
+
+if __name__ == "__main__":
+    unittest.main()
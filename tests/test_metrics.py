@@ -0,0 +1,60 @@
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+from support import A_HELD, gamepad, report
+
+def metric_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+class MetricsExporterTest(unittest.TestCase):
+    def setUp(self):
+        self.reader = gamepad.GamePadReader(backend=object())
+        self.exporter = gamepad.MetricsExporter(self.reader, port=0)
+
+    def test_latency_runs_from_read_to_end_of_processing(self):
+        read_ns = time.monotonic_ns() - 3_000_000  # The chain took 3 ms
+        self.exporter.observe(read_ns, A_HELD)
+        text = self.exporter.render()
+
+        self.assertIn('gamepad_processing_latency_seconds_bucket{le="0.0025"} 0', text)
+        self.assertIn('gamepad_processing_latency_seconds_bucket{le="0.005"} 1', text)
+        self.assertIn('gamepad_processing_latency_seconds_bucket{le="+Inf"} 1', text)
+        self.assertIn("gamepad_processing_latency_seconds_count 1", text)
+        latency_sum = float(metric_lines(text, "gamepad_processing_latency_seconds_sum")[0].split()[1])
+        self.assertGreaterEqual(latency_sum, 0.003)
+
+    def test_gauges_show_latest_report(self):
+        self.exporter.observe(time.monotonic_ns(), report(byte3=0x10, left_x=-32768, r2=255))
+        text = self.exporter.render()
+        self.assertIn('gamepad_button_pressed{button="A"} 1', text)
+        self.assertIn('gamepad_button_pressed{button="B"} 0', text)
+        self.assertIn(f'gamepad_axis_percent{{axis="left_x"}} {gamepad.axis_percent(-32768):.3f}', text)
+        self.assertIn('gamepad_axis_percent{axis="left_y"} 0.000', text)
+        self.assertIn('gamepad_trigger_level{trigger="R2"} 1.0000', text)
+
+    def test_no_gauges_before_the_first_report(self):
+        self.assertEqual(metric_lines(self.exporter.render(), "gamepad_button_pressed"), [])
+
+    def test_serves_read_stats_over_http(self):
+        self.reader.stats.record_report(1_000_000)
+        self.reader.stats.record_timeout()
+        self.exporter.start()
+        try:
+            url = f"http://{self.exporter.host}:{self.exporter.port}"
+            with urllib.request.urlopen(url + "/metrics", timeout=5) as response:
+                self.assertEqual(response.status, 200)
+                text = response.read().decode()
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                urllib.request.urlopen(url + "/other", timeout=5)
+            self.assertEqual(raised.exception.code, 404)
+        finally:
+            self.exporter.stop()
+
+        self.assertIn("gamepad_reports_total 1", text)
+        self.assertIn("gamepad_read_timeouts_total 1", text)
+        self.assertIn("gamepad_connected 1", text)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+from support import gamepad
+
+usb1 = gamepad.usb1  # Optional python-libusb1
+
+class FakeEndpoint:
+    bEndpointAddress = 0x81
+    wMaxPacketSize = 32
+
+class FakeTransfer:
+    def __init__(self):
+        self.status = None
+        self.data = b""
+        self.submitted = 0
+        self.interrupt = None
+
+    def setInterrupt(self, endpoint, buffer_or_len, callback=None, timeout=0):
+        self.interrupt = (endpoint, buffer_or_len, timeout)
+
+    def getStatus(self):
+        return self.status
+
+    def getActualLength(self):
+        return len(self.data)
+
+    def getBuffer(self):
+        return self.data
+
+    def submit(self):
+        self.submitted += 1
+
+class FakeHandle:
+    def getTransfer(self):
+        return FakeTransfer()
+
+MS = 1_000_000
+
+class ReadStatsTest(unittest.TestCase):
+    def test_gap_longer_than_interval_counts_drops(self):
+        stats = gamepad.ReadStats(expected_interval_ns=MS)
+        for timestamp_ns in (0, MS, 2 * MS, 6 * MS):
+            stats.record_report(timestamp_ns)
+        self.assertEqual(stats.inferred_drops, 3)
+        self.assertEqual(stats.max_gap_ns, 4 * MS)
+
+    def test_gap_with_a_timeout_is_not_drops(self):
+        stats = gamepad.ReadStats(expected_interval_ns=MS)
+        stats.record_report(0)
+        stats.record_timeout()
+        stats.record_report(500 * MS)
+        stats.record_report(501 * MS)
+        self.assertEqual((stats.inferred_drops, stats.max_gap_ns, stats.timeouts), (0, MS, 1))
+
+    def test_outage_is_downtime_not_drops(self):
+        stats = gamepad.ReadStats(expected_interval_ns=MS)
+        stats.record_report(0)
+        stats.record_report(MS)
+        stats.record_disconnect(2 * MS)
+        self.assertFalse(stats.snapshot()["connected"])
+        self.assertEqual(stats.record_reconnect(202 * MS), 200 * MS)
+        stats.record_report(203 * MS)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["inferred_drops"], 0)
+        self.assertEqual(snapshot["downtime_s"], 0.2)
+        self.assertTrue(snapshot["connected"])
+
+@unittest.skipIf(usb1 is None, "python-libusb1 is not installed")
+class AsyncTransferTimeoutTest(unittest.TestCase):
+    def setUp(self):
+        self.reader = gamepad.GamePadReader(poll_interval=0.1, backend=object())
+        self.reader.endpoint = FakeEndpoint()
+        self.reader.stats = gamepad.ReadStats(expected_interval_ns=MS)
+        self.idle = []
+        self.engine = gamepad.AsyncTransferEngine(self.reader, lambda *report: None,
+                                                  num_transfers=2, idle=self.idle.append,
+                                                  poll_interval=0.05)
+        self.engine.handle = FakeHandle()
+        self.engine._allocate_transfers()
+        self.engine.running = True
+
+    def test_transfers_time_out_after_poll_interval(self):
+        self.assertEqual([transfer.interrupt for transfer in self.engine.transfers],
+                         [(0x81, 32, 50)] * 2)
+
+    def test_timed_out_transfer_is_counted_and_resubmitted(self):
+        transfer = self.engine.transfers[0]
+        transfer.status = usb1.TRANSFER_COMPLETED
+        transfer.data = bytes(20)
+        self.engine._on_complete(transfer)
+        transfer.status = usb1.TRANSFER_TIMED_OUT
+        self.engine._on_complete(transfer)
+        transfer.status = usb1.TRANSFER_COMPLETED
+        self.engine._on_complete(transfer)
+
+        stats = self.reader.stats
+        self.assertEqual((stats.reports, stats.timeouts, stats.inferred_drops), (2, 1, 0))
+        self.assertEqual(len(self.idle), 1)
+        self.assertEqual(transfer.submitted, 3)
+
+if __name__ == "__main__":
+    unittest.main()
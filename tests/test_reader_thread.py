@@ -0,0 +1,28 @@
+import errno
+import unittest
+
+from support import gamepad, report, simulated_reader
+
+class RingOverrunTest(unittest.TestCase):
+    def test_stalled_consumer_keeps_newest_reports_and_counts_overruns(self):
+        reports = [report(left_x=i) for i in range(500)]
+        reader, pad = simulated_reader(reports, rate_hz=20000)
+        ring = gamepad.RawReportRing(capacity=8, report_size=reader.report_size())
+        thread = gamepad.ReportReaderThread(reader, ring)
+        thread.start()
+        thread.join(timeout=10)  # Nothing is popped until the pad runs dry
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(thread.error.errno, errno.ENODEV)
+
+        popped = []
+        item = ring.pop()
+        while item is not None:
+            popped.append(item[1])
+            item = ring.pop()
+
+        self.assertEqual(len(popped), ring.capacity - 1)
+        self.assertEqual(popped, reports[-len(popped):])
+        self.assertEqual(ring.overruns, len(reports) - len(popped))
+
+if __name__ == "__main__":
+    unittest.main()
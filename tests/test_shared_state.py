@@ -0,0 +1,109 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import unittest
+
+from support import REPO
+
+import gamepad_state
+from gamepad_state import SEQ_STRUCT, GamepadState, SharedStatePublisher
+
+READER = """
+import json, sys
+from gamepad_state import SharedStateReader
+
+name, mode = sys.argv[1], sys.argv[2]
+with SharedStateReader(name) as reader:
+    if mode == "once":
+        result = reader.read()
+        print(json.dumps(None if result is None else [result[0], result[1].buttons,
+              result[1].dpad, result[1].l2, result[1].r2, result[1].left_x,
+              result[1].left_y, result[1].right_x, result[1].right_y,
+              result[1].timestamp_ns, result[1].button_names]))
+    elif mode == "timeout":
+        try:
+            reader.read(timeout=0.05)
+            print(json.dumps("read"))
+        except TimeoutError:
+            print(json.dumps("timeout"))
+    else:
+        # Every published state has all fields derived from one counter
+        reads = torn = 0
+        last = 0
+        while last < int(mode):
+            result = reader.read(timeout=5)
+            if result is None:
+                continue
+            seq, state = result
+            n = state.timestamp_ns
+            reads += 1
+            if (state.buttons, state.left_x, state.right_y, state.l2) != (
+                    n, n % 32768, -(n % 32768), n % 256):
+                torn += 1
+            last = n
+        print(json.dumps([reads, torn]))
+"""
+
+def run_reader(name, mode):
+    """Run a reader in a separate process, as a real consumer would"""
+    result = subprocess.run([sys.executable, "-c", READER, name, mode], cwd=REPO,
+                            capture_output=True, text=True, timeout=60)
+    if result.returncode:
+        raise AssertionError(result.stderr)
+    return json.loads(result.stdout)
+
+@unittest.skipIf(sys.version_info < (3, 8), "multiprocessing.shared_memory needs Python 3.8+")
+class SharedStateTest(unittest.TestCase):
+    def setUp(self):
+        self.publisher = SharedStatePublisher()
+        self.addCleanup(self.publisher.close)
+
+    def test_reader_sees_nothing_before_the_first_publish(self):
+        self.assertIsNone(run_reader(self.publisher.name, "once"))
+
+    def test_reader_gets_the_latest_state(self):
+        self.publisher.publish(GamepadState(buttons=0x10, dpad=1, l2=3, r2=250,
+                                            left_x=-32768, left_y=5, right_x=32767,
+                                            right_y=-7, timestamp_ns=123))
+        self.publisher.publish(GamepadState(buttons=gamepad_state.BUTTON_A | gamepad_state.BUTTON_START,
+                                            dpad=8, l2=4, r2=5, left_x=1, left_y=-2,
+                                            right_x=3, right_y=-4, timestamp_ns=456))
+        self.assertEqual(run_reader(self.publisher.name, "once"),
+                         [2, 0x1010, 8, 4, 5, 1, -2, 3, -4, 456, ["Start", "A"]])
+
+    def test_block_outlives_the_reader_process(self):
+        self.publisher.publish(GamepadState(timestamp_ns=1))
+        run_reader(self.publisher.name, "once")
+        self.assertEqual(run_reader(self.publisher.name, "once")[0], 1)
+
+    def test_publisher_dying_mid_write_times_out(self):
+        self.publisher.publish(GamepadState(timestamp_ns=1))
+        SEQ_STRUCT.pack_into(self.publisher.buf, 0, 3)  # Odd: left mid-update
+        self.assertEqual(run_reader(self.publisher.name, "timeout"), "timeout")
+
+    def test_concurrent_reads_never_see_a_torn_state(self):
+        count = 200000
+        stop = threading.Event()
+
+        def publish():
+            n = 1
+            while not stop.is_set():
+                self.publisher.publish(GamepadState(buttons=n, l2=n % 256,
+                                                    left_x=n % 32768, right_y=-(n % 32768),
+                                                    timestamp_ns=n))
+                n += 1 if n < count else 0
+
+        writer = threading.Thread(target=publish)
+        writer.start()
+        try:
+            reads, torn = run_reader(self.publisher.name, str(count))
+        finally:
+            stop.set()
+            writer.join()
+        self.assertGreater(reads, 0)
+        self.assertEqual(torn, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from support import IDLE, gamepad, quiet, read_until_unplugged, report, simulated_reader
+
+class DeviceSetupTest(unittest.TestCase):
+    def test_find_and_setup_use_interrupt_in_endpoint(self):
+        reader, pad = simulated_reader([IDLE], rate_hz=1000)
+        self.assertEqual((reader.device.idVendor, reader.device.idProduct), (0x045e, 0x028e))
+        self.assertEqual(reader.endpoint.bEndpointAddress, 0x81)
+        self.assertEqual(reader.interface_number, 0)
+        self.assertEqual(reader.stats.expected_interval_ns, 1_000_000)
+        self.assertEqual(reader.device_id, "001:001")
+
+    def test_disconnected_pad_is_not_found(self):
+        pad = gamepad.SimulatedGamepad([IDLE])
+        pad.connected = False
+        reader = gamepad.GamePadReader(backend=gamepad.SimulatedBackend([pad]))
+        self.assertFalse(quiet(reader.find_device))
+
+    def test_serial_number_is_served(self):
+        reader, pad = simulated_reader([IDLE], serial="SIM0042")
+        self.assertEqual(reader.device.serial_number, "SIM0042")
+
+    def test_iter_reports_yields_every_report_in_order(self):
+        reports = [report(left_x=i) for i in range(200)]
+        reader, pad = simulated_reader(reports)
+        records = read_until_unplugged(reader.iter_reports())
+
+        self.assertEqual([bytes(data) for _, data in records], reports)
+        timestamps = [timestamp_ns for timestamp_ns, _ in records]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(reader.stats.reports, 200)
+        self.assertEqual(reader.stats.usb_errors, 1)  # The final unplug
+
+if __name__ == "__main__":
+    unittest.main()
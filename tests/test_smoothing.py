@@ -0,0 +1,141 @@
+import errno
+import math
+import time
+import unittest
+
+import usb.core
+
+from support import gamepad, quiet, report
+
+class ChangeOnlyPad(gamepad.SimulatedGamepad):
+    """Pad that times out once its reports are used up, like an idle 045e:028e"""
+
+    def read(self, timeout_ms):
+        try:
+            return super().read(timeout_ms)
+        except usb.core.USBError as e:
+            if e.errno != errno.ENODEV:
+                raise
+        self.connected = True
+        time.sleep(timeout_ms / 1000)
+        raise usb.core.USBTimeoutError("Operation timed out", errno=errno.ETIMEDOUT)
+
+def left_x(data):
+    return gamepad.AXES_STRUCT.unpack_from(data, gamepad.AXES_OFFSET)[0]
+
+class EmaFilterTest(unittest.TestCase):
+    def test_moves_alpha_of_the_way(self):
+        ema = gamepad.EmaFilter(0.25)
+        self.assertEqual(ema(0.0, 0), 0.0)
+        self.assertEqual(ema(1.0, 1), 0.25)
+        self.assertEqual(ema(1.0, 2), 0.4375)
+        ema.reset()
+        self.assertEqual(ema(-0.5, 3), -0.5)
+
+    def test_alpha_one_passes_through(self):
+        ema = gamepad.EmaFilter(1.0)
+        self.assertEqual([ema(v, 0) for v in (0.5, -0.75, 0.25)], [0.5, -0.75, 0.25])
+
+    def test_rejects_invalid_alpha(self):
+        for alpha in (0, -0.1, 1.5):
+            with self.assertRaises(ValueError):
+                gamepad.EmaFilter(alpha)
+
+class OneEuroFilterTest(unittest.TestCase):
+    def step_response(self, **params):
+        """Output 10 ms after a step from 0 to 1 at 1 kHz"""
+        one_euro = gamepad.OneEuroFilter(**params)
+        one_euro(0.0, 0)
+        value = None
+        for ms in range(1, 11):
+            value = one_euro(1.0, ms * 1_000_000)
+        return value
+
+    def test_constant_input_passes_unchanged(self):
+        one_euro = gamepad.OneEuroFilter()
+        self.assertEqual([one_euro(0.3, ms * 1_000_000) for ms in range(5)], [0.3] * 5)
+
+    def test_step_converges_and_beta_reduces_lag(self):
+        slow = self.step_response(beta=0.0)
+        fast = self.step_response(beta=5.0)
+        self.assertGreater(slow, 0.0)
+        self.assertLess(slow, fast)
+        self.assertLess(fast, 1.0)
+
+    def test_first_order_low_pass_without_beta(self):
+        # With beta 0 each 1 ms step moves 1 / (1 + tau / dt) toward the input
+        one_euro = gamepad.OneEuroFilter(min_cutoff=1.0, beta=0.0)
+        one_euro(0.0, 0)
+        alpha = 1 / (1 + 1 / (2 * math.pi * 1.0 * 0.001))
+        self.assertAlmostEqual(one_euro(1.0, 1_000_000), alpha)
+
+    def test_repeated_timestamp_keeps_output(self):
+        one_euro = gamepad.OneEuroFilter()
+        one_euro(0.0, 5)
+        self.assertEqual(one_euro(1.0, 5), 0.0)
+
+    def test_axis_filter_parses_specs(self):
+        self.assertIsNone(gamepad.axis_filter("none"))
+        self.assertEqual(gamepad.axis_filter("ema:0.3").alpha, 0.3)
+        one_euro = gamepad.axis_filter("one-euro:2,0.1")
+        self.assertEqual((one_euro.min_cutoff, one_euro.beta, one_euro.d_cutoff), (2.0, 0.1, 1.0))
+        for spec in ("median", "ema:a", "ema:0.1,0.2", "none:1"):
+            with self.assertRaises(ValueError):
+                gamepad.axis_filter(spec)
+
+class AxisSmootherTest(unittest.TestCase):
+    def test_filters_only_configured_axes(self):
+        smoother = gamepad.AxisSmoother({"left_x": gamepad.EmaFilter(0.5)})
+        smoother.apply_report(0, report(left_x=0, right_x=0))
+        out = smoother.apply_report(1, report(left_x=32000, right_x=32000))
+        self.assertEqual(gamepad.AXES_STRUCT.unpack_from(out, gamepad.AXES_OFFSET),
+                         (16000, 0, 32000, 0))
+
+    def test_released_stick_settles_once_reports_stop(self):
+        for spec in ("ema:0.2", "one-euro"):
+            smoother = gamepad.AxisSmoother({"left_x": gamepad.axis_filter(spec)},
+                                            settle_time=0.05)
+            for ms in range(20):
+                smoother.apply_report(ms * 1_000_000, report(left_x=32000))
+            released = smoother.apply_report(20_000_000, report(left_x=0))
+            self.assertGreater(left_x(released), 5000, spec)  # Still lagging behind
+
+            self.assertIsNone(smoother.settle(60_000_000))  # Only 40 ms without reports
+            settled = smoother.settle(70_000_000)
+            self.assertEqual(left_x(settled), 0, spec)
+            self.assertIsNone(smoother.settle(80_000_000))  # Nothing new to settle
+
+            # The filter restarts from the settled position
+            out = smoother.apply_report(90_000_000, report(left_x=0))
+            self.assertEqual(left_x(out), 0, spec)
+
+    def test_unknown_axis_is_rejected(self):
+        with self.assertRaises(ValueError):
+            gamepad.AxisSmoother({"left_z": gamepad.EmaFilter()})
+
+class IdleReadTest(unittest.TestCase):
+    def test_acquire_calls_idle_on_timeouts(self):
+        pad = ChangeOnlyPad([report(left_x=32000), report(left_x=0)], rate_hz=1000)
+        reader = gamepad.GamePadReader(poll_interval=0.02,
+                                       backend=gamepad.SimulatedBackend([pad]))
+        self.assertTrue(quiet(reader.find_device) and quiet(reader.setup_device))
+        smoother = gamepad.AxisSmoother({"left_x": gamepad.EmaFilter(0.2)}, settle_time=0.03)
+        outputs = []
+
+        def handle(timestamp_ns, data):
+            outputs.append(left_x(smoother.apply_report(timestamp_ns, data)))
+
+        def idle(timestamp_ns):
+            data = smoother.settle(timestamp_ns)
+            if data is not None:
+                outputs.append(left_x(data))
+                reader.stop()
+
+        reader.acquire(handle, idle=idle)
+
+        self.assertEqual(outputs[:2], [32000, 25600])
+        self.assertEqual(outputs[-1], 0)
+        self.assertGreater(reader.stats.timeouts, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import math
+import unittest
+
+from support import gamepad, report
+
+FULL = 32767
+
+def axes(data):
+    return gamepad.AXES_STRUCT.unpack_from(data, gamepad.AXES_OFFSET)
+
+class StickResponseTest(unittest.TestCase):
+    def test_linear_without_deadzone_is_identity(self):
+        for mode in ("radial", "axial"):
+            apply = gamepad.StickResponse(0.0, "linear", mode).compile()
+            for value in range(-FULL, FULL + 1):
+                self.assertEqual(apply(value, 0), (value, 0), mode)
+                self.assertEqual(apply(0, value), (0, value), mode)
+            for value in range(-FULL, FULL + 1, 97):
+                self.assertEqual(apply(value, -value), (value, -value), mode)
+            self.assertEqual(apply(-32768, -32768), (-FULL, -FULL), mode)
+
+    def test_deadzone_zeroes_small_movements(self):
+        for mode in ("radial", "axial"):
+            apply = gamepad.StickResponse(0.2, "linear", mode).compile()
+            self.assertEqual(apply(6000, 0), (0, 0), mode)
+            self.assertEqual(apply(0, -6500), (0, 0), mode)
+            self.assertEqual(apply(FULL, 0), (FULL, 0), mode)
+
+    def test_axial_table_rescales_travel_outside_deadzone(self):
+        apply = gamepad.StickResponse(0.2, "linear", "axial").compile()
+        half = round(0.6 * FULL)  # Halfway between the deadzone edge and full travel
+        x, y = apply(half, -half)
+        self.assertAlmostEqual(x, FULL / 2, delta=1)
+        self.assertEqual(y, -x)
+        # Each axis is clipped on its own, so a small diagonal stays at zero
+        self.assertEqual(apply(5000, 5000), (0, 0))
+
+    def test_radial_table_keeps_direction(self):
+        apply = gamepad.StickResponse(0.2, "linear", "radial").compile()
+        # 15% on each axis is 21% from center, just outside the deadzone
+        x, y = apply(5000, 5000)
+        self.assertGreater(x, 0)
+        self.assertEqual(x, y)
+        x, y = apply(20000, -10000)
+        self.assertAlmostEqual(math.atan2(y, x), math.atan2(-10000, 20000), places=3)
+        magnitude = math.hypot(20000, 10000) / FULL
+        self.assertAlmostEqual(math.hypot(x, y) / FULL, (magnitude - 0.2) / 0.8, places=2)
+
+    def test_quadratic_curve(self):
+        apply = gamepad.StickResponse(0.0, "quadratic", "axial").compile()
+        x, y = apply(FULL // 2, -FULL // 2)
+        self.assertAlmostEqual(x, FULL / 4, delta=1)
+        self.assertAlmostEqual(y, -FULL / 4, delta=1)
+
+    def test_curves_steeper_than_linear_stay_in_range_at_full_diagonal(self):
+        curves = ("0.5", 0.3, lambda t: min(1.0, 3 * t), lambda t: math.sqrt(t))
+        for curve in curves:
+            shaper = gamepad.StickShaper(gamepad.StickResponse(0.05, curve, "radial"),
+                                         gamepad.StickResponse(0.0, curve, "radial"))
+            for x, y in ((FULL, FULL), (-32768, -32768), (FULL, -32768), (23170, 23170)):
+                data = shaper.apply_report(report(left_x=x, left_y=y, right_x=x, right_y=y))
+                for value in axes(data):
+                    self.assertLessEqual(abs(value), FULL)
+                if x == y:
+                    self.assertEqual(axes(data)[0], axes(data)[1])
+
+    def test_invalid_settings_are_rejected(self):
+        for kwargs in ({"deadzone": 1.0}, {"deadzone": -0.1}, {"mode": "square"},
+                       {"curve": "exotic"}, {"curve": "-2"}):
+            with self.assertRaises(ValueError):
+                gamepad.StickResponse(**kwargs)
+
+class StickShaperTest(unittest.TestCase):
+    def test_calibration_is_folded_into_the_tables(self):
+        calibration = gamepad.Calibration({"left_x": (-30000, 1500, 29000)},
+                                          {"l2": (20, 220)})
+        shaper = gamepad.StickShaper(calibration=calibration)
+        data = shaper.apply_report(report(left_x=1500, l2=20, r2=255))
+        self.assertEqual(axes(data), (0, 0, 0, 0))
+        self.assertEqual((data[4], data[5]), (0, 255))
+        data = shaper.apply_report(report(left_x=29000, l2=220))
+        self.assertEqual((axes(data)[0], data[4]), (FULL, 255))
+
+    def test_apply_shapes_a_state_in_place(self):
+        shaper = gamepad.StickShaper(gamepad.StickResponse(0.2), gamepad.StickResponse(0.0))
+        state = gamepad.decode_report(report(left_x=3000, right_x=3000))
+        self.assertIs(shaper.apply(state), state)
+        self.assertEqual((state.left_x, state.right_x), (0, 3000))
+
+    def test_short_packets_pass_through(self):
+        shaper = gamepad.StickShaper(gamepad.StickResponse(0.2))
+        packet = bytes([0x01, 0x03, 0x0e])
+        self.assertIs(shaper.apply_report(packet), packet)
+
+    def test_input_report_is_not_modified(self):
+        shaper = gamepad.StickShaper(gamepad.StickResponse(0.2))
+        original = report(left_x=3000)
+        self.assertEqual(axes(shaper.apply_report(original))[0], 0)
+        self.assertEqual(axes(original)[0], 3000)
+
+if __name__ == "__main__":
+    unittest.main()
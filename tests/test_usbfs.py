@@ -0,0 +1,33 @@
+import os
+import tempfile
+import unittest
+
+from support import gamepad
+
+# Device descriptor of the supported controller (045e:028e), no configurations
+DEVICE_DESCRIPTOR = bytes.fromhex("12010002ff00ff08 5e048e02 1401 010203 00".replace(" ", ""))
+
+class SysfsPortNumbersTest(unittest.TestCase):
+    def test_port_chain_is_parsed_from_device_name(self):
+        self.assertEqual(gamepad.sysfs_port_numbers("1-1.2"), (1, 2))
+        self.assertEqual(gamepad.sysfs_port_numbers("3-4"), (4,))
+        self.assertEqual(gamepad.sysfs_port_numbers("2-1.4.3"), (1, 4, 3))
+        self.assertIsNone(gamepad.sysfs_port_numbers("usb1"))
+
+    def test_enumerated_device_reports_its_ports(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "1-1.2")
+            os.mkdir(path)
+            for name, value in (("busnum", "1\n"), ("devnum", "5\n"), ("speed", "12\n")):
+                with open(os.path.join(path, name), "w") as f:
+                    f.write(value)
+            with open(os.path.join(path, "descriptors"), "wb") as f:
+                f.write(DEVICE_DESCRIPTOR)
+
+            [device] = gamepad.UsbfsBackend(root, root).enumerate_devices()
+        self.assertEqual(device.descriptor.port_numbers, (1, 2))
+        self.assertEqual(device.descriptor.port_number, 2)
+        self.assertEqual((device.descriptor.bus, device.descriptor.address), (1, 5))
+
+if __name__ == "__main__":
+    unittest.main()